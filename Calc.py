@@ -1,17 +1,36 @@
-import sympy as smp
-from fuzzywuzzy import process
+"""Pet value calculator (Calc.py formulas).
+
+    python Calc.py                          interactive prompts
+    python Calc.py --worker                 JSON lines on stdin -> stdout
+    python Calc.py --worker --socket PATH   JSON lines over a Unix socket
+
+Worker mode answers one request per line, e.g.
+``{"id": 1, "type": "shop", "variant": "shiny", "price": 25000, "demand": 7, "c": 0.35}``
+with ``{"id": 1, "value": ..., "latency_us": ...}`` (or ``"error"``), in
+order.  Clients may pipeline: write many requests before reading.
+``{"stats": true}`` returns latency percentiles so far.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import stat
+import sys
+import time
 from decimal import Decimal
 
+from engine import cli_value
+from matcher import find_closest_match
+
+TYPE_OPTIONS = ["permenant", "limited", "non-secret", "pass", "shop"]
+VARIANT_OPTIONS = ["normal", "shiny", "mythic", "shiny mythic"]
 
-def find_closest_match(input_string, valid_strings, threshold=70):
-    match, score = process.extractOne(input_string, valid_strings)
-    if score >= threshold:
-        return match
-    return None
 
 def main():
-    type_options = ["permenant", "limited", "non-secret", "pass", "shop"]
-    variant_options = ["normal", "shiny", "mythic", "shiny mythic"]
+    type_options = TYPE_OPTIONS
+    variant_options = VARIANT_OPTIONS
 
     while True:  # Main loop
         type_input = input("Is the pet permenant, limited, non-secret, pass or shop? ").lower()
@@ -39,30 +58,11 @@ def main():
                     print("Could not recognize variant. Try again.")
                     continue
 
-                x_sym = smp.Symbol('x')
-
-                # Normal
-                if variant_input == "normal":
-                    i1 = smp.integrate(smp.sqrt(rarity / (exist + 1)), (x_sym, 0, exist + 1))
-                    i2 = smp.integrate(smp.sqrt(rarity / (exist)), (x_sym, 0, exist))
-                # Shiny
-                elif variant_input == "shiny":
-                    i1 = smp.integrate(smp.sqrt(rarity*40 / (exist + 1)), (x_sym, 0, exist + 1))
-                    i2 = smp.integrate(smp.sqrt(rarity*40 / (exist)), (x_sym, 0, exist))
-                # Mythic
-                elif variant_input == "mythic":
-                    i1 = smp.integrate(smp.sqrt(rarity*80 / (exist + 1)), (x_sym, 0, exist + 1))
-                    i2 = smp.integrate(smp.sqrt(rarity*80 / (exist)), (x_sym, 0, exist))
-                # Shiny Mythic
-                elif variant_input == "shiny mythic":
-                    i1 = smp.integrate(smp.sqrt(rarity*320 / (exist + 1)), (x_sym, 0, exist + 1))
-                    i2 = smp.integrate(smp.sqrt(rarity*320 / exist), (x_sym, 0, exist))
-                else:
+                if variant_input not in ["normal", "shiny", "mythic", "shiny mythic"]:
                     print("Invalid variant.")
                     continue
 
-                diff = (i1 - i2) * (1 + 0.05 * smp.exp(0.25 * demand))
-                value = diff.evalf()
+                value = cli_value(type_input, variant_input, exist=exist, rarity=rarity, demand=demand)
                 print(f"Estimated Value: {value}")
 
                 cont = input("Would you like to continue? Y/N: ").strip().lower()
@@ -71,7 +71,7 @@ def main():
                 else:
                     break  # Go back to top of main loop
 
-        elif type_input in ["pass", "non secret"]:
+        elif type_input in ["pass", "non-secret"]:
             while True:
                 try:
                     rarity = Decimal(input("Enter Rarity: "))
@@ -93,25 +93,17 @@ def main():
                     print("Could not recognize variant. Try again.")
                     continue
 
-                x_sym = smp.Symbol('x')
-
-                if variant_input == "normal":
-                    i1 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1))
-                    i2 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand))
-                    diff = (i1 - i2) ** 3
-                    diff = smp.sqrt(diff) / 2
-                else:
+                variant_multi = None
+                if variant_input != "normal":
                     try:
                         variant_multi = int(input("Enter a variant multiplier: "))
                     except ValueError:
                         print("Enter a valid number")
                         continue
-                    i1 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1))
-                    i2 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand))
-                    diff = ((i1 - i2) ** 3) / (1 / (variant_multi / 10))
-                    diff = 0.5 * smp.sqrt(diff)
 
-                value = diff.evalf()
+                value = cli_value(
+                    type_input, variant_input, rarity=rarity, demand=demand, c=c, variant_multi=variant_multi
+                )
                 print(f"Estimated Value: {value}")
 
                 cont = input("Would you like to continue? Y/N: ").strip().lower()
@@ -137,24 +129,17 @@ def main():
                     print("Could not recognize variant. Try again.")
                     continue
 
-                x_sym = smp.Symbol('x')
-
                 if variant_input == "normal":
-                    i1 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand + 1))
-                    i2 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand))
-                    diff = (i1 - i2) ** 1.5
-                    diff = 0.5 * smp.sqrt(diff)
+                    variant_multi = None
                 elif variant_input == "shiny":
-                    m = int(input("Enter Variant Multiplier: "))
-                    i1 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand + 1))
-                    i2 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand))
-                    diff = ((i1 - i2) ** 1.5) / (1 / (m / 10))
-                    diff = 0.5 * smp.sqrt(diff)
+                    variant_multi = int(input("Enter Variant Multiplier: "))
                 else:
                     print("Invalid variant.")
                     continue
 
-                value = diff.evalf()
+                value = cli_value(
+                    type_input, variant_input, price=price, demand=demand, c=c, variant_multi=variant_multi
+                )
                 print(f"Estimated Value: {value}")
 
                 cont = input("Would you like to continue? Y/N: ").strip().lower()
@@ -166,5 +151,141 @@ def main():
         else:
             print("Unrecognized pet type. Please try again.")
 
+
+# ──────────────────────────  Worker mode  ──────────────────────────
+INPUT_FIELDS = ("exist", "rarity", "demand", "c", "price", "variant_multi")
+
+READ_SIZE = 65536
+
+
+def answer(request, stats):
+    """Response dict for one decoded request."""
+    if request.get("stats"):
+        return {"stats": stats.summary()}
+    type_input = find_closest_match(str(request.get("type", "")).lower(), TYPE_OPTIONS)
+    if type_input is None:
+        raise ValueError(f"Unrecognized pet type: {request.get('type')!r}")
+    variant_input = find_closest_match(str(request.get("variant", "normal")).lower(), VARIANT_OPTIONS)
+    if variant_input is None:
+        raise ValueError(f"Unrecognized variant: {request.get('variant')!r}")
+    inputs = {name: float(request[name]) for name in INPUT_FIELDS if request.get(name) is not None}
+    value = cli_value(type_input, variant_input, **inputs)
+    if value is None:
+        raise ValueError(f"No formula for {type_input}/{variant_input}")
+    if not math.isfinite(value):
+        raise ValueError("Value is not a finite number")
+    return {"type": type_input, "variant": variant_input, "value": value}
+
+
+def answer_line(line, stats):
+    """Encoded response line for one encoded request line."""
+    started = time.perf_counter()
+    request_id = None
+    try:
+        request = json.loads(line, parse_constant=_reject_constant)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        request_id = request.get("id")
+        response = answer(request, stats)
+        route = "stats" if "stats" in response else "value"
+    except (ValueError, TypeError, ZeroDivisionError, OverflowError) as e:
+        response = {"error": str(e)}
+        route = "error"
+    seconds = time.perf_counter() - started
+    stats.record(route, seconds)
+    response = {"id": request_id, **response, "latency_us": round(seconds * 1e6, 1)}
+    return (json.dumps(response, allow_nan=False) + "\n").encode()
+
+
+def _reject_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def answer_chunk(data, stats):
+    """Answer every complete line of ``data``: ``(leftover, responses)``.
+
+    A pipelined chunk's responses go out in one write."""
+    *lines, rest = data.split(b"\n")
+    return rest, b"".join(answer_line(line, stats) for line in lines if line.strip())
+
+
+def warm_up():
+    """Compile the formulas and build the matchers before the first request."""
+    import formulas
+
+    formulas.precompile(("math",))
+    find_closest_match("", TYPE_OPTIONS)
+    find_closest_match("", VARIANT_OPTIONS)
+
+
+def serve_stdin(stats):
+    fd_in, out = sys.stdin.fileno(), sys.stdout.buffer
+    pending = b""
+    while chunk := os.read(fd_in, READ_SIZE):
+        pending, responses = answer_chunk(pending + chunk, stats)
+        if responses:
+            out.write(responses)
+            out.flush()
+    if pending.strip():
+        out.write(answer_line(pending, stats))
+        out.flush()
+
+
+async def serve_socket(path, stats):
+    async def connection(reader, writer):
+        pending = b""
+        try:
+            while chunk := await reader.read(READ_SIZE):
+                pending, responses = answer_chunk(pending + chunk, stats)
+                if responses:
+                    writer.write(responses)
+                    await writer.drain()
+            if pending.strip():
+                writer.write(answer_line(pending, stats))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)  # left behind by a previous worker
+    server = await asyncio.start_unix_server(connection, path)
+    # Stop cleanly on SIGTERM as well as Ctrl-C, so the socket file is removed.
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"Calc worker listening on {path}", file=sys.stderr)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        os.unlink(path)
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Pet value calculator (Calc.py formulas).")
+    parser.add_argument("--worker", action="store_true", help="answer JSON-lines requests instead of prompting")
+    parser.add_argument("--socket", help="with --worker, listen on this Unix socket instead of stdin")
+    args = parser.parse_args(argv)
+    if not args.worker:
+        main()
+        return
+
+    from server import LatencyStats
+
+    stats = LatencyStats()
+    warm_up()
+    try:
+        if args.socket:
+            asyncio.run(serve_socket(args.socket, stats))
+        else:
+            serve_stdin(stats)
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(stats.summary()), file=sys.stderr)
+
+
 if __name__ == "__main__":
-    main()
+    run()
@@ -1,8 +1,14 @@
-import streamlit as st
-import sympy as smp
-from fuzzywuzzy import process
+import os
+import time
 from decimal import Decimal
 
+import streamlit as st
+
+import instrument
+from engine import variant_multipliers
+
+rerun_start = time.perf_counter()
+
 # ──────────────────────────  Page config  ──────────────────────────
 st.set_page_config(
     page_title="Pet Value Calculator",
@@ -54,167 +60,57 @@ st.markdown(
 
 st.title("🔥 Pet Value Calculator")
 
-# ───────────────────────  Variant multipliers  ─────────────────────
-variant_multipliers = {
-    "normal": 1,
-    "shiny": 40,
-    "mythic": 80,
-    "shiny mythic": 400,
-}
 
+# ───────────────────────  Shared resources  ───────────────────────
+# Built once per server process and shared by every session and rerun.
+# fuzzywuzzy and sqlite are only imported the first time they are needed.
+@st.cache_resource
+def compiled_formulas():
+    import formulas
+    formulas.precompile()
+    return formulas.SETS
 
-# ────────────────────────  Helper functions  ───────────────────────
-def find_closest_match(input_string, valid_strings, threshold=70):
-    match, score = process.extractOne(input_string, valid_strings)
-    return match if score >= threshold else None
-
-
-def calculate_value(
-        type_input,
-        variant_input,
-        exist=None,
-        rarity=None,
-        demand=None,
-        c=None,
-        price=None,
-        variant_multi=None,
-        island_chance=None,
-):
-    x_sym = smp.Symbol("x")
-    multiplier = variant_multipliers.get(variant_input, 1)
-
-    if type_input in ["Permanent", "Limited"]:
-        # i1 = smp.integrate(
-        #     smp.sqrt((rarity * multiplier) / (exist + 2)), (x_sym, 0, exist + 2)
-        # )
-        # i2 = smp.integrate(
-        #     smp.sqrt((rarity * multiplier) / exist), (x_sym, 0, exist)
-        # )
-        multiplier_factor = 0.1 if type_input == "permanent" else 0.25
-        diff = 2 * (smp.sqrt((rarity * multiplier) / exist) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
-
-    elif type_input == "Rift":
-        multiplier_factor = 0.1 if availability == "Still Obtainable" else 0.25
-        if availability == "Still Obtainable":
-            safe_lower = 1e-6  # prevent divide by zero
-            const_expr = (rarity * multiplier) * (island_chance / 100)
-            i1 = smp.integrate(
-                smp.sqrt(const_expr / (exist + 1)), (x_sym, safe_lower, exist + 1)
-            )
-            i2 = smp.integrate(
-                smp.sqrt(const_expr / exist), (x_sym, safe_lower, exist)
-            )
-            diff = 2 * ((i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
-        else:
-            safe_lower = 1e-6
-            const_expr = (rarity * multiplier) * (island_chance / 100)
-            i1 = smp.integrate(
-                smp.sqrt(const_expr / (exist + 1)), (x_sym, safe_lower, exist + 1)
-            )
-            i2 = smp.integrate(
-                smp.sqrt(const_expr / exist), (x_sym, safe_lower, exist)
-            )
-            diff = 2 * ((i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
-
-    elif type_input == "Legendary Pass":
-        if availability == "Still Obtainable":
-            i1 = smp.integrate(
-                (((1 + smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1)
-            )
-            i2 = smp.integrate(
-                (((1 + smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand)
-            )
-            diff = (i1 - i2) ** 2.5
-            if variant_input == "normal":
-                diff = 2 * (smp.sqrt(diff) * 0.1)
-            else:
-                diff = diff / (1 / (variant_multi / 3))
-                diff = 2 * (0.1 * smp.sqrt(diff))
-        else:
-            i1 = smp.integrate(
-                (((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1)
-            )
-            i2 = smp.integrate(
-                (((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand)
-            )
-            diff = (i1 - i2) ** 2.5
-            if variant_input == "normal":
-                diff = 2 * (smp.sqrt(diff) * 0.2)
-            else:
-                diff = diff / (1 / (variant_multi / 3))
-                diff = 2 * (smp.sqrt(diff) * 0.2)
-
-    elif type_input == "Secret Pass":
-        multiplier_factor = 0.1 if availability == "Still Obtainable" else 0.25
-        if availability == "Still Obtainable":
-            if variant_input == "normal":
-                i1 = smp.integrate(
-                    smp.sqrt((rarity ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
-                )
-                i2 = smp.integrate(
-                    smp.sqrt((rarity ** 2) / exist), (x_sym, 0, exist)
-                )
-                diff = 2 * (i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand))
-            else:
-                i1 = smp.integrate(
-                    smp.sqrt(((rarity * variant_multi) ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
-                )
-                i2 = smp.integrate(
-                    smp.sqrt(((rarity * variant_multi) ** 2) / exist), (x_sym, 0, exist)
-                )
-                diff = ((i1 - i2) ** 2) / (1 / (variant_multi / 3))
-                diff = 2 * (smp.cbrt(diff) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
-        else:
-            if variant_input == "normal":
-                i1 = smp.integrate(
-                    smp.sqrt((rarity ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
-                )
-                i2 = smp.integrate(
-                    smp.sqrt((rarity ** 2) / exist), (x_sym, 0, exist)
-                )
-                diff = 2 * (i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand))
-            else:
-                i1 = smp.integrate(
-                    smp.sqrt(((rarity * variant_multi) ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
-                )
-                i2 = smp.integrate(
-                    smp.sqrt(((rarity * variant_multi) ** 2) / exist), (x_sym, 0, exist)
-                )
-                diff = ((i1 - i2) ** 2) / (1 / (variant_multi / 3))
-                diff = 2 * (smp.cbrt(diff) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
-
-    elif type_input == "Shop":
-        if variant_input == "normal":
-            i1 = smp.integrate(
-                (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand + 1)
-            )
-            i2 = smp.integrate(
-                (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand)
-            )
-            diff = (i1 - i2) ** 1.25
-            diff = 2 * (0.5 * smp.sqrt(diff))
-
-        elif variant_input != "normal":
-            i1 = smp.integrate(
-                (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand + 1)
-            )
-            i2 = smp.integrate(
-                (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand)
-            )
-            diff = (i1 - i2) ** 1.25
-            diff = 0.25 * (diff / (1 / variant_multi))
-            diff = 2 * smp.sqrt(diff)
-        
-    else:
-        return None
 
-    return diff.evalf()
+@st.cache_resource
+def valuation_cache():
+    from cache import ValuationCache
+    return ValuationCache(path=os.environ.get("PETCALC_CACHE"))
 
 
+@st.cache_resource
+def name_matcher(valid_strings):
+    from matcher import Matcher
+    return Matcher(valid_strings)
 
 
+@st.cache_resource
+def pet_catalog(path):
+    from catalog import Catalog
+    return Catalog(path, mode="r")
 
 
+@st.cache_resource
+def speculation_pool():
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+
+
+compiled_formulas()
+
+# ───────────────────────  Developer toggle  ───────────────────────
+# Only offered when the operator starts the app with PETCALC_DEV=1.  The
+# panel is per session; instrumentation is process-wide, so switching it on
+# times every session until the same toggle is switched off again.
+dev_mode = os.environ.get("PETCALC_DEV", "") not in ("", "0") and st.sidebar.toggle(
+    "Developer stats",
+    key="dev_mode",
+    on_change=lambda: instrument.enable(st.session_state.dev_mode),
+)
+
+
+# ────────────────────────  Helper functions  ───────────────────────
+def find_closest_match(input_string, valid_strings, threshold=70):
+    return name_matcher(tuple(valid_strings)).match(input_string, threshold)
 
 
 # ────────────────────────────  UI  ────────────────────────────
@@ -236,10 +132,7 @@ if pet_type in ["Permanent", "Limited"]:
 
     demand = st.slider("Enter demand (1‑20)", 1, 20)
 
-    if st.button("Calculate Value"):
-        value = calculate_value(
-            pet_type, variant, exist=exist, rarity=rarity, demand=demand
-        )
+    params = dict(exist=exist, rarity=rarity, demand=demand)
 
 # ────────────────────────────────  Rift  ───────────────   ─────────────────
 elif pet_type == "Rift":
@@ -254,15 +147,13 @@ elif pet_type == "Rift":
     )
 
     demand = st.slider("Enter demand (1‑20)", 1, 20)
-    if st.button("Calculate Value"):
-        value = calculate_value(
-            pet_type,
-            variant,
-            exist=exist,
-            rarity=rarity,
-            demand=demand,
-            island_chance=island_chance,
-        )
+    params = dict(
+        exist=exist,
+        rarity=rarity,
+        demand=demand,
+        island_chance=island_chance,
+        availability=availability,
+    )
 
 # ───────────────────────────────  PASS  ────────────────────────────────
 elif pet_type == "Legendary Pass":
@@ -277,15 +168,7 @@ elif pet_type == "Legendary Pass":
         f"**Rarity:** {int(rarity):,}  |  **Demand:** {demand}/10 | **C:** {c}"
     )
 
-    if st.button("Calculate Value"):
-        value = calculate_value(
-            pet_type,
-            variant,
-            rarity=float(rarity),
-            demand=demand,
-            c=float(c),
-            variant_multi=variant_multi,
-        )
+    params = dict(rarity=float(rarity), demand=demand, c=float(c), availability=availability)
 
 elif pet_type == "Secret Pass":
     availability = st.selectbox("Select Availability", ["Still Obtainable", "Limited"])
@@ -307,15 +190,7 @@ elif pet_type == "Secret Pass":
         f"**Rarity:** {int(rarity):,}  |  **Exist:** {exist:,}  |  **Demand:** {demand}/10"
     )
 
-    if st.button("Calculate Value"):
-        value = calculate_value(
-            pet_type,
-            variant,
-            rarity=Decimal(rarity),
-            exist=exist,
-            demand=demand,
-            variant_multi=variant_multi
-        )
+    params = dict(rarity=Decimal(rarity), exist=exist, demand=demand, availability=availability)
 
 # ───────────────────────────────  SHOP  ────────────────────────────────
 elif pet_type == "Shop":
@@ -326,23 +201,220 @@ elif pet_type == "Shop":
     # ▼ Live preview
     st.caption(f"**Preview — Price:** {price:,} • c:** {c:,.3f}")
 
-    if st.button("Calculate Value"):
-        value = calculate_value(
-            pet_type,
-            variant,
-            price=price,
-            demand=demand,
-            c=Decimal(c),
-            variant_multi=variant_multi,
-        )
+    params = dict(price=price, demand=demand, c=Decimal(c))
+
+# Value every variant for these inputs in the background, so switching
+# variant (or clicking Calculate) is answered from the finished job.
+if "speculation" not in st.session_state:
+    from speculate import Speculation
+    st.session_state.speculation = Speculation(speculation_pool(), valuation_cache().calculate_value)
+speculation = st.session_state.speculation
+speculation.update(pet_type, params)
+
+if st.button("Calculate Value"):
+    value = speculation.value(variant, params.get("availability"), timeout=0.05)
+    if value is None:
+        value = valuation_cache().calculate_value(pet_type, variant, variant_multi=variant_multi, **params)
 
 # ───────────────────────────  Result display  ───────────────────────────
 if value is not None:
     try:
-        evaluated = value.evalf()
-        if evaluated.is_number:
-            st.markdown(f"### 📈 Estimated Value: **{round(float(evaluated), 2):,}**")
-        else:
-            st.warning("The expression could not be fully evaluated.")
-    except Exception as e:
+        st.markdown(f"### 📈 Estimated Value: **{round(float(value), 2):,}**")
+    except (OverflowError, ValueError) as e:
         st.error(f"Error converting value: {e}")
+
+# ─────────────────────────  Variant comparison  ─────────────────────────
+comparison_pending = speculation.table(timeout=0.05) is None
+
+
+@st.fragment(run_every=0.25 if comparison_pending else None)
+def variant_comparison():
+    table = speculation.table()
+    if table is None:
+        st.caption("Valuing every variant…")
+        return
+    if comparison_pending:
+        st.rerun()  # finished: redraw once without polling
+    import pandas as pd
+
+    frame = pd.DataFrame.from_dict(table, orient="index")
+    frame.index = [f"▶ {name}" if name == variant else name for name in frame.index]
+    st.dataframe(frame.map(lambda v: f"{float(v):,.2f}" if v is not None else "—"))
+
+
+with st.expander("All variants", expanded=True):
+    variant_comparison()
+
+# ─────────────────────────────  Sweep  ─────────────────────────────
+if st.toggle("📊 Sweep mode"):
+    import altair as alt
+    import pandas as pd
+
+    from sweep import AXES, axis_values, downsample, SweepGrid
+
+    axis_name = AXES[pet_type]
+    axis_defaults = {"exist": (1.0, 1000.0, 1.0), "c": (0.01, 2.0, 0.01), "price": (100.0, 100000.0, 100.0)}
+    axis_lo, axis_hi, axis_step = axis_defaults[axis_name]
+
+    col1, col2 = st.columns(2)
+    demand_lo, demand_hi = col1.slider("Demand range", 1, 20, (1, 20))
+    demand_step = col2.number_input("Demand step", min_value=0.01, max_value=1.0, value=1.0, format="%.2f")
+    col1, col2, col3 = st.columns(3)
+    axis_lo = col1.number_input(f"{axis_name} from", min_value=axis_step, value=axis_lo)
+    axis_hi = col2.number_input(f"{axis_name} to", min_value=axis_step, value=axis_hi)
+    axis_step = col3.number_input(f"{axis_name} step", min_value=axis_step / 100, value=axis_step)
+    sweep_variants = st.multiselect("Variants", list(variant_multipliers), default=list(variant_multipliers))
+
+    demand_values = axis_values(demand_lo, demand_hi, demand_step)
+    axis_grid = axis_values(axis_lo, max(axis_lo, axis_hi), axis_step)
+    if sweep_variants:
+        sweep_grid = st.session_state.setdefault("sweep_grid", SweepGrid())
+        grids = sweep_grid.update(pet_type, params, demand_values, axis_grid, sweep_variants)
+        st.caption(
+            f"{len(demand_values) * len(axis_grid) * len(sweep_variants):,} cells "
+            f"({sweep_grid.computed_cells:,} recomputed)"
+        )
+
+        frames = []
+        for name, grid in grids.items():
+            small, rows, cols = downsample(grid, demand_values, axis_grid)
+            frame = pd.DataFrame(small, index=rows, columns=cols).rename_axis(index="demand", columns=axis_name)
+            frames.append(frame.stack().rename("value").reset_index().assign(variant=name))
+        heat = pd.concat(frames)
+        st.altair_chart(
+            alt.Chart(heat).mark_rect().encode(
+                x=alt.X(f"{axis_name}:O", axis=alt.Axis(labels=False, ticks=False)),
+                y=alt.Y("demand:O", sort="descending", axis=alt.Axis(labels=False, ticks=False)),
+                color=alt.Color("value:Q", scale=alt.Scale(type="symlog", scheme="inferno")),
+                tooltip=["variant", "demand", axis_name, alt.Tooltip("value:Q", format=",.2f")],
+            ).properties(width=140, height=140).facet(facet="variant:N", columns=2)
+        )
+
+        shown = variant if variant in grids else sweep_variants[0]
+        small, rows, cols = downsample(grids[shown], demand_values, axis_grid, max_rows=40, max_cols=12)
+        st.caption(f"{shown} (sampled rows/columns)")
+        st.dataframe(pd.DataFrame(small, index=rows, columns=cols).rename_axis(index="demand", columns=axis_name))
+
+# ──────────────────────────  Uncertainty  ──────────────────────────
+if st.toggle("🎲 Uncertainty mode"):
+    import pandas as pd
+
+    from montecarlo import Normal, Uniform, simulate
+
+    st.caption("Give a range or mean ± std for inputs you are unsure of.")
+    inputs = dict(params)
+    for name, point in params.items():
+        if isinstance(point, str):
+            continue
+        point = float(point)
+        col1, col2, col3 = st.columns([2, 3, 3])
+        kind = col1.selectbox(name, ["Fixed", "Range", "Mean ± std"], key=f"mc_kind_{name}")
+        if kind == "Range":
+            low = col2.number_input(f"{name} from", value=point * 0.9, key=f"mc_low_{name}")
+            high = col3.number_input(f"{name} to", value=point * 1.1, key=f"mc_high_{name}")
+            inputs[name] = Uniform(low, high)
+        elif kind == "Mean ± std":
+            mean = col2.number_input(f"{name} mean", value=point, key=f"mc_mean_{name}")
+            std = col3.number_input(f"{name} std", min_value=0.0, value=abs(point) * 0.1, key=f"mc_std_{name}")
+            inputs[name] = Normal(mean, std)
+
+    col1, col2 = st.columns(2)
+    samples = col1.number_input("Samples", min_value=1_000, max_value=20_000_000, value=1_000_000, step=100_000)
+    seed = col2.number_input("Seed", min_value=0, value=0, step=1)
+    if st.button("Run simulation"):
+        started = time.perf_counter()
+        st.session_state.uncertainty = simulate(pet_type, variant, inputs, n=int(samples), seed=int(seed))
+        st.session_state.uncertainty_seconds = time.perf_counter() - started
+
+    result = st.session_state.get("uncertainty")
+    if result is not None:
+        st.caption(f"{result.valid:,} valid samples in {st.session_state.uncertainty_seconds:.2f}s (seed {result.seed})")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Mean", f"{result.mean:,.2f}")
+        col2.metric("5th pct", f"{result.percentiles[5]:,.2f}")
+        col3.metric("Median", f"{result.percentiles[50]:,.2f}")
+        col4.metric("95th pct", f"{result.percentiles[95]:,.2f}")
+        if len(result.counts):
+            centres = (result.edges[:-1] + result.edges[1:]) / 2
+            st.bar_chart(pd.DataFrame({"samples": result.counts}, index=pd.Index(centres.round(2), name="value")))
+
+# ──────────────────────────  Inverse  ──────────────────────────
+if st.toggle("🎯 Inverse mode"):
+    import pandas as pd
+
+    from inverse import parse_targets, solve, unknowns
+
+    solvable = unknowns(pet_type, variant, params.get("availability"))
+    col1, col2 = st.columns([2, 3])
+    unknown = col1.selectbox("Solve for", solvable)
+    target_text = col2.text_input("Target values", "1M, 10M", help="Comma-separated; k/m/b/t suffixes allowed")
+    try:
+        targets = parse_targets(target_text)
+    except ValueError:
+        st.error("Couldn't read the target values.")
+        targets = []
+    if unknown and targets:
+        known = {name: point if isinstance(point, str) else float(point)
+                 for name, point in params.items() if name != unknown}
+        solved = solve(pet_type, variant, unknown, targets, variant_multi=variant_multi, **known)
+        st.dataframe(pd.DataFrame({"target": targets, unknown: solved}).style.format("{:,.4f}", na_rep="unreachable"),
+                     hide_index=True)
+
+# ──────────────────────────  Trade  ──────────────────────────
+if st.toggle("🤝 Trade mode"):
+    import pandas as pd
+
+    from trade import evaluate
+
+    catalog_path = os.environ.get("PETCALC_CATALOG")
+    if not catalog_path:
+        st.info("Trades look pets up in a catalog: start the app with PETCALC_CATALOG=pets.npy.")
+    else:
+        st.caption("One pet per line, e.g. `3x Shiny Huge Cat` or `Huge Cat x2`.")
+        col1, col2 = st.columns(2)
+        give_text = col1.text_area("You give", height=200)
+        receive_text = col2.text_area("You receive", height=200)
+        if st.button("Evaluate trade"):
+            started = time.perf_counter()
+            st.session_state.trade = evaluate(pet_catalog(catalog_path), give_text, receive_text)
+            st.session_state.trade_seconds = time.perf_counter() - started
+
+        trade = st.session_state.get("trade")
+        if trade is not None:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("You give", f"{trade.give.total:,.2f}")
+            col2.metric("You receive", f"{trade.receive.total:,.2f}")
+            col3.metric("Ratio", f"{trade.ratio:,.3f}", f"{trade.ratio - 1:+.1%} ({trade.verdict})"
+                        if trade.ratio < float("inf") else trade.verdict)
+            st.caption(f"{len(trade.give.pets) + len(trade.receive.pets):,} distinct pets valued "
+                       f"in {st.session_state.trade_seconds * 1000:.1f} ms")
+            col1, col2 = st.columns(2)
+            for column, side in ((col1, trade.give), (col2, trade.receive)):
+                if side.pets:
+                    column.dataframe(pd.DataFrame(side.pets).sort_values("total", ascending=False), hide_index=True)
+                if side.unmatched:
+                    column.warning("No pet matches: " + ", ".join(side.unmatched))
+
+# ───────────────────────────  Developer panel  ───────────────────────────
+if dev_mode:
+    instrument.record("rerun", pet_type, time.perf_counter() - rerun_start)
+    rows, counters = instrument.summary()
+    with st.sidebar:
+        st.subheader("Valuation stats")
+        st.dataframe(rows, hide_index=True)
+        if counters:
+            st.dataframe(counters, hide_index=True)
+        st.caption(f"Speculation: {speculation.started:,} jobs, {speculation.cancelled:,} cancelled")
+        if st.button("Reset stats"):
+            instrument.reset()
+
+        sampler = st.session_state.get("stack_sampler")
+        if sampler is None or not sampler.running:
+            if st.button("Start stack sampling"):
+                st.session_state.stack_sampler = instrument.StackSampler().start()
+                st.rerun()
+        elif st.button("Stop stack sampling"):
+            sampler.stop()
+            st.rerun()
+        if sampler is not None and sampler.stacks:
+            st.download_button("Download collapsed stacks", sampler.collapsed(), file_name="petcalc.folded")
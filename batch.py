@@ -0,0 +1,143 @@
+"""Vectorised valuation of many pets at once.
+
+``calculate_values`` is the array counterpart of ``engine.calculate_value``:
+every argument may be a scalar or an array, they are broadcast together, rows
+are grouped by pet type, variant and availability, and each group runs the
+NumPy build of its ``formulas`` entry once; rows ``precision`` flags as
+ill-conditioned are recomputed with mpmath.  Unknown pet types come back as
+NaN.
+"""
+import numpy as np
+
+import formulas
+import precision
+
+COLUMNS = [
+    "type_input",
+    "variant_input",
+    "exist",
+    "rarity",
+    "demand",
+    "c",
+    "price",
+    "variant_multi",
+    "island_chance",
+    "availability",
+]
+
+NUMERIC_COLUMNS = ["exist", "rarity", "demand", "c", "price", "variant_multi", "island_chance"]
+
+
+# ────────────────────────────  API  ────────────────────────────
+def calculate_values(
+        type_input,
+        variant_input,
+        exist=None,
+        rarity=None,
+        demand=None,
+        c=None,
+        price=None,
+        variant_multi=None,
+        island_chance=None,
+        availability=None,
+        formula_set="web",
+):
+    """Value many pets at once with the PetCalculator.py formulas (or the
+    Calc.py ones with ``formula_set="cli"``).
+
+    Arguments mirror ``engine.calculate_value``; ``None`` or NaN in
+    ``variant_multi`` falls back to the set's variant multiplier table.
+    Returns a float64 array.
+    """
+    formula_set = formulas.SETS[formula_set]
+    numeric = {
+        name: np.nan if value is None else np.asarray(value, dtype=float)
+        for name, value in zip(NUMERIC_COLUMNS, [exist, rarity, demand, c, price, variant_multi, island_chance])
+    }
+    labels = [
+        np.asarray(value, dtype=object)
+        for value in [type_input, variant_input, "" if availability is None else availability]
+    ]
+    if all(label.ndim == 0 for label in labels):
+        return _single_branch(formula_set, *(label.item() for label in labels), numeric)
+
+    arrays = np.broadcast_arrays(*labels, *numeric.values())
+    shape = arrays[0].shape
+    types, variants, availabilities = (np.ravel(a) for a in arrays[:3])
+    columns = dict(zip(NUMERIC_COLUMNS, (np.ravel(a) for a in arrays[3:])))
+    obtainable = availabilities == "Still Obtainable"
+
+    # Sort rows once by (type, variant, obtainable) and run each group's
+    # formula on its slice, instead of masking every column per group.
+    # Rows of unknown type are left out and stay NaN.
+    variant_names = sorted(set(variants.tolist()), key=str)
+    codes = obtainable.astype(np.int32)
+    known = np.zeros(types.shape, dtype=bool)
+    for i, type_name in enumerate(formula_set.types):
+        mask = types == type_name
+        known |= mask
+        codes[mask] += i * len(variant_names) * 2
+    for i, variant in enumerate(variant_names):
+        codes[variants == variant] += i * 2
+    order = np.flatnonzero(known)
+    order = order[np.argsort(codes[order], kind="stable")]
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+
+    out = np.full(types.shape, np.nan)
+    with np.errstate(all="ignore"):
+        for start, end in zip(starts, [*starts[1:], len(order)]):
+            rows = order[start:end]
+            first = rows[0]
+            index = formula_set.resolve(types[first], variants[first], "Still Obtainable" if obtainable[first] else None)
+            if index is not None:
+                out[rows] = _call(formula_set, index, variants[first], {k: v[rows] for k, v in columns.items()})
+    return out.reshape(shape)
+
+
+def _call(formula_set, index, variant_input, columns):
+    multiplier = formula_set.multipliers.get(variant_input, 1)
+    variant_multi = np.where(np.isnan(columns["variant_multi"]), multiplier, columns["variant_multi"])
+    args = (
+        columns["exist"], columns["rarity"], columns["demand"], columns["c"], columns["price"],
+        variant_multi, columns["island_chance"], multiplier,
+    )
+    values, conditions = formula_set.compiled("numpy", checked=True)[index](*args)
+    formula = formula_set.formulas[index]
+    reasons = precision.check_array(formula, values, conditions, columns["c"])
+    risky = reasons >= 0
+    if not risky.any():
+        return values
+
+    # Recompute just the rows float64 can't be trusted with.
+    shape = np.broadcast_shapes(risky.shape, *(np.shape(arg) for arg in args))
+    values = np.array(np.broadcast_to(values, shape), dtype=float)
+    risky = np.broadcast_to(risky, shape)
+    rows = [np.broadcast_to(arg, shape)[risky].astype(float) for arg in args]
+    values[risky] = precision.recompute_array(formula_set, index, rows, np.broadcast_to(reasons, shape)[risky])
+    return values
+
+
+def _single_branch(formula_set, type_input, variant_input, availability, numeric):
+    """Fast path when every row shares one type, variant and availability
+    (parameter grids): run the formula once on the broadcast numeric arrays."""
+    shape = np.broadcast_shapes(*(np.shape(column) for column in numeric.values()))
+    index = formula_set.resolve(type_input, variant_input, availability)
+    if index is None:
+        return np.full(shape, np.nan)
+    with np.errstate(all="ignore"):
+        out = _call(formula_set, index, variant_input, numeric)
+    return np.array(np.broadcast_to(out, shape), dtype=float)
+
+
+def calculate_values_from(table):
+    """Value every row of a column table.
+
+    ``table`` is anything indexable by column name: a dict of arrays, a
+    pandas DataFrame or a NumPy structured array.  Missing columns are
+    treated as ``None``.
+    """
+    if isinstance(table, np.ndarray) and table.dtype.names:
+        names = table.dtype.names
+    else:
+        names = list(table.keys())
+    return calculate_values(**{name: table[name] for name in COLUMNS if name in names})
@@ -0,0 +1,315 @@
+"""Benchmark suite for every valuation path.
+
+Covers every pet type x variant x availability branch of the web formulas,
+every type/variant path of ``Calc.main`` (driven with scripted input) and
+its JSON-lines worker, the fuzzy matcher, the batch/bulk paths and each
+compiled formula.  Each case reports per-call latency percentiles,
+throughput and peak traced memory.  Runs offline.
+
+    python bench.py --output results.json
+    python bench.py --save-baseline bench_baseline.json
+    python bench.py --baseline bench_baseline.json --threshold 0.25
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import engine
+from formulas import AVAILABILITIES, WEB
+
+WEB_INPUTS = {
+    "Permanent": dict(exist=250, rarity=1_000_000.0, demand=12),
+    "Limited": dict(exist=250, rarity=1_000_000.0, demand=12),
+    "Rift": dict(exist=250, rarity=1_000_000.0, demand=12, island_chance=4.5),
+    "Legendary Pass": dict(rarity=50_000.0, demand=12, c=0.35),
+    "Secret Pass": dict(exist=250, rarity=1_000_000.0, demand=12),
+    "Shop": dict(price=25_000, demand=12, c=0.35),
+}
+
+# Types whose formulas read ``availability``.
+AVAILABILITY_TYPES = {type_input for type_input, fields in WEB.fields.items() if "availability" in fields}
+
+
+# ──────────────────────────  Cases  ──────────────────────────
+def web_cases(backend="float"):
+    for type_input, inputs in WEB_INPUTS.items():
+        for variant in engine.variant_multipliers:
+            availabilities = AVAILABILITIES if type_input in AVAILABILITY_TYPES else (None,)
+            for availability in availabilities:
+                name = f"web/{type_input}/{variant}" + (f"/{availability}" if availability else "")
+                if backend != "float":
+                    name += f"/{backend}"
+
+                def call(type_input=type_input, variant=variant, availability=availability, inputs=inputs):
+                    engine.calculate_value(type_input, variant, availability=availability, backend=backend, **inputs)
+
+                yield name, call
+
+
+def cli_scripts():
+    for type_input in ["permenant", "limited"]:
+        for variant in engine.cli_variant_multipliers:
+            yield f"cli/{type_input}/{variant}", [type_input, "250", "1000000", "7", "y", variant, "n"]
+    for type_input in ["pass", "non-secret"]:
+        for variant in engine.cli_variant_multipliers:
+            multi = [] if variant == "normal" else ["35"]
+            yield f"cli/{type_input}/{variant}", [type_input, "50000", "7", "0.35", "y", variant, *multi, "n"]
+    yield "cli/shop/normal", ["shop", "25000", "7", "0.35", "normal", "n"]
+    yield "cli/shop/shiny", ["shop", "25000", "7", "0.35", "shiny", "35", "n"]
+
+
+def run_cli(script):
+    """Run ``Calc.main`` once, answering its prompts from ``script``."""
+    import Calc
+
+    answers = iter(script)
+    original = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            Calc.main()
+    finally:
+        builtins.input = original
+    if "Estimated Value" not in out.getvalue():
+        raise RuntimeError(f"Calc.main produced no value for {script}")
+
+
+def cli_cases():
+    for name, script in cli_scripts():
+        yield name, lambda script=script: run_cli(script)
+
+    import subprocess
+
+    import Calc
+    from server import LatencyStats
+
+    request = b'{"id": 1, "type": "shop", "variant": "shiny", "price": 25000, "demand": 7, "c": 0.35}\n'
+    stats = LatencyStats()
+    worker = None
+
+    def round_trip():
+        # The worker is started by the first (warm-up) call, so -k can skip it.
+        nonlocal worker
+        if worker is None:
+            worker = subprocess.Popen([sys.executable, Calc.__file__, "--worker"], stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        worker.stdin.write(request)
+        worker.stdin.flush()
+        worker.stdout.readline()
+
+    try:
+        yield "cli/worker/answer_line", lambda: Calc.answer_line(request, stats)
+        yield "cli/worker/round_trip", round_trip
+        yield "cli/process/spawn", lambda: subprocess.run([sys.executable, Calc.__file__, "--worker"],
+                                                          input=request, capture_output=True, check=True)
+    finally:
+        if worker is not None:
+            worker.stdin.close()
+            worker.wait()
+
+
+def matcher_cases():
+    from matcher import Matcher, find_closest_match, pet_names
+
+    yield "matcher/find_closest_match/options", lambda: find_closest_match("shiny mythc", list(engine.variant_multipliers))
+    names = pet_names(1_000)
+    matcher = Matcher(names, cache_size=0)
+    queries = iter(range(10**9))
+    yield "matcher/1k/uncached", lambda: matcher.extract_one(names[next(queries) % len(names)].lower()[:-1])
+
+
+def batch_cases(rows=10_000):
+    import numpy as np
+
+    import batch
+    import bulk
+
+    rng = np.random.default_rng(0)
+    types = np.array(list(WEB_INPUTS), dtype=object)[rng.integers(0, len(WEB_INPUTS), rows)]
+    columns = dict(
+        type_input=types,
+        variant_input=np.array(list(engine.variant_multipliers), dtype=object)[rng.integers(0, 4, rows)],
+        availability=np.array(AVAILABILITIES, dtype=object)[rng.integers(0, 2, rows)],
+        exist=rng.integers(1, 5_000, rows).astype(float),
+        rarity=rng.uniform(1, 1e6, rows),
+        demand=rng.integers(1, 21, rows).astype(float),
+        c=rng.uniform(0.01, 3, rows),
+        price=rng.integers(1, 100_000, rows).astype(float),
+        island_chance=rng.uniform(0.1, 100, rows),
+    )
+    yield f"batch/calculate_values/{rows}", lambda: batch.calculate_values(**columns)
+
+    records = [
+        {name: (value.item() if hasattr(value, "item") else value) for name, value in zip(columns, row)}
+        for row in zip(*columns.values())
+    ][:1_000]
+    yield "bulk/result_chunk/1000", lambda: bulk.result_chunk(records)
+
+    from montecarlo import Normal, Uniform, simulate
+
+    uncertain = dict(exist=Normal(250, 25), rarity=Uniform(8e5, 1.2e6), demand=Uniform(10, 14),
+                     island_chance=Uniform(3, 6), availability="Still Obtainable")
+    yield "montecarlo/Rift/1M", lambda: simulate("Rift", "shiny", uncertain, n=1_000_000, seed=0)
+
+    from inverse import solve
+
+    known = dict(rarity=1e6, demand=12, island_chance=4.5, availability="Still Obtainable")
+    yield "inverse/Rift/exist", lambda: solve("Rift", "shiny", "exist", 500, **known)
+    targets = np.geomspace(1, 3_000, 1_000)
+    yield "inverse/Rift/exist/1000", lambda: solve("Rift", "shiny", "exist", targets, **known)
+
+
+def formula_cases():
+    """Each compiled formula of every set on the same inputs, for side-by-side
+    comparison of the web and CLI models."""
+    import formulas
+
+    inputs = (250.0, 1_000_000.0, 12.0, 0.35, 25_000.0, 35.0, 4.5, 40)
+    for formula_set in formulas.SETS.values():
+        for i, function in enumerate(formula_set.compiled("math")):
+            formula = formula_set.formulas[i]
+            yield f"formulas/{formula_set.name}/{i}/{formula.types[0]}", lambda function=function: function(*inputs)
+
+
+SUITES = {
+    "web": web_cases,
+    "cli": cli_cases,
+    "matcher": matcher_cases,
+    "batch": batch_cases,
+    "formulas": formula_cases,
+}
+
+
+# ──────────────────────────  Measurement  ──────────────────────────
+def measure(call, min_time=0.2, min_calls=20, max_calls=100_000, warmup=3):
+    for _ in range(warmup):
+        call()
+
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_calls and (len(samples) < min_calls or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        call()
+        samples.append(time.perf_counter_ns() - start)
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    total = sum(samples)
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] / 1000
+
+    return {
+        "calls": len(samples),
+        "mean_us": total / len(samples) / 1000,
+        "p50_us": pct(50),
+        "p90_us": pct(90),
+        "p99_us": pct(99),
+        "max_us": samples[-1] / 1000,
+        "stdev_us": statistics.pstdev(samples) / 1000,
+        "throughput_per_s": len(samples) / (total / 1e9),
+        "peak_kib": peak / 1024,
+    }
+
+
+def run(suites, min_time=0.2, sympy=False, pattern=None, out=print):
+    results = {}
+    groups = [(suite, SUITES[suite]()) for suite in suites]
+    if sympy:
+        groups.append(("sympy", web_cases("sympy")))
+    for suite, cases in groups:
+        for name, call in cases:
+            if pattern and pattern not in name:
+                continue
+            results[name] = stats = measure(call, min_time=min_time, min_calls=3 if suite == "sympy" else 20)
+            stats["suite"] = suite
+            out(
+                f"{name:<52} p50 {stats['p50_us']:>10.1f} us  p99 {stats['p99_us']:>10.1f} us  "
+                f"{stats['throughput_per_s']:>12,.0f}/s  peak {stats['peak_kib']:>8.1f} KiB"
+            )
+    return results
+
+
+def missing(results, baseline, suites, pattern=None):
+    """Baseline cases this run selected but did not measure (renamed or
+    removed cases, which ``compare`` cannot check)."""
+    return sorted(
+        name for name, before in baseline.items()
+        if name not in results
+        and before.get("suite", suites[0]) in suites
+        and (not pattern or pattern in name)
+    )
+
+
+def compare(results, baseline, threshold):
+    """Cases whose p50 latency regressed by more than ``threshold`` (a fraction)."""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None or before["p50_us"] <= 0:
+            continue
+        change = stats["p50_us"] / before["p50_us"] - 1
+        if change > threshold:
+            regressions.append((name, before["p50_us"], stats["p50_us"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every valuation path.")
+    parser.add_argument("--suite", choices=SUITES, action="append", help="run only these suites (repeatable)")
+    parser.add_argument("-k", dest="pattern", help="run only cases whose name contains this")
+    parser.add_argument("--sympy", action="store_true", help="also time the sympy reference backend (slow)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to sample each case")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--save-baseline", help="write results as a new baseline JSON")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    import formulas
+
+    suites = args.suite or list(SUITES)
+    results = run(suites, args.min_time, args.sympy, args.pattern)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "formula_versions": {name: formula_set.version for name, formula_set in formulas.SETS.items()},
+        "results": results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            before = json.load(f)
+        baseline = before["results"]
+        for name, version in report["formula_versions"].items():
+            if before.get("formula_versions", {}).get(name, version) != version:
+                print(f"Note: {name} formulas changed since the baseline ({before['formula_versions'][name]} -> {version})")
+        regressions = compare(results, baseline, args.threshold)
+        for name, before_us, after_us, change in regressions:
+            print(f"REGRESSION {name}: p50 {before_us:.1f} -> {after_us:.1f} us (+{change:.0%})")
+        absent = missing(results, baseline, suites + (["sympy"] if args.sympy else []), args.pattern)
+        for name in absent:
+            print(f"MISSING {name}: in the baseline but not measured")
+        if regressions or absent:
+            return 1
+        print(f"No p50 regressions beyond {args.threshold:.0%} or missing cases vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
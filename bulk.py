@@ -0,0 +1,281 @@
+"""Headless bulk valuation of pet catalogs.
+
+Streams CSV or JSON-lines records (from a file or stdin) through
+``engine.calculate_value`` in chunks spread over a process pool, and writes
+each record back out with a ``value`` field and an ``error`` field (in
+JSON lines, only when it can't be valued), in input order.  Unreadable
+lines become errors on their own records rather than ending the run.  Only a bounded
+number of chunks is in flight at once, so memory stays flat however large
+the input is.
+
+    python bulk.py catalog.csv -o valued.csv
+    cat catalog.jsonl | python bulk.py --format jsonl > valued.jsonl
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import calculate_value, variant_multipliers
+from formulas import WEB
+
+FIELDS = {
+    "type": "type_input",
+    "type_input": "type_input",
+    "variant": "variant_input",
+    "variant_input": "variant_input",
+    "availability": "availability",
+    "exist": "exist",
+    "rarity": "rarity",
+    "demand": "demand",
+    "c": "c",
+    "price": "price",
+    "variant_multi": "variant_multi",
+    "island_chance": "island_chance",
+}
+
+TEXT_FIELDS = {"type_input", "variant_input", "availability"}
+
+# Formula inputs a record may leave out: the variant's multiplier and
+# availability (anything but "Still Obtainable" is limited) have defaults.
+OPTIONAL_FIELDS = {"variant_multi", "availability"}
+
+
+def record_kwargs(record):
+    """Map a raw input record onto ``calculate_value`` keyword arguments."""
+    kwargs = {}
+    for key, value in record.items():
+        name = FIELDS.get(key)
+        if name is None or value is None or value == "":
+            continue
+        kwargs[name] = value if name in TEXT_FIELDS else float(value)
+    return kwargs
+
+
+def check_kwargs(kwargs):
+    """Raise ValueError, with a message fit for a client, if ``kwargs``
+    can't be valued.  The variant defaults to "normal"."""
+    type_input = kwargs.get("type_input")
+    if type_input is None:
+        raise ValueError("missing pet type")
+    if type_input not in WEB.fields:
+        raise ValueError(f"unknown pet type {type_input!r}")
+    variant_input = kwargs.setdefault("variant_input", "normal")
+    if variant_input not in variant_multipliers:
+        raise ValueError(f"unknown variant {variant_input!r}")
+    missing = [name for name in WEB.fields[type_input] if name not in kwargs and name not in OPTIONAL_FIELDS]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)} for {type_input}")
+
+
+class InvalidRecord(dict):
+    """An input record that couldn't be read: whatever fields it had, plus
+    the reason, reported as that record's error instead of ending the run."""
+
+    def __init__(self, error, fields=()):
+        super().__init__(fields)
+        self.error = error
+
+
+def value_result(record):
+    """``(value, error)`` for one record; exactly one of them is None."""
+    if isinstance(record, InvalidRecord):
+        return None, record.error
+    if not isinstance(record, dict):
+        return None, "record is not an object"
+    try:
+        kwargs = record_kwargs(record)
+        check_kwargs(kwargs)
+    except (TypeError, ValueError) as exc:
+        return None, f"invalid record: {exc}"
+    try:
+        value = calculate_value(**kwargs)
+    except (TypeError, ValueError, ZeroDivisionError, OverflowError) as exc:
+        return None, f"cannot value record: {exc}"
+    if value is None:
+        return None, "no formula for this pet"
+    if not math.isfinite(value):
+        return None, "value is too large to represent"
+    return value, None
+
+
+def result_chunk(records):
+    return [value_result(record) for record in records]
+
+
+def json_safe(value):
+    """``value``, with non-finite floats (which JSON can't carry) as None."""
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+# ──────────────────────────  Formats  ──────────────────────────
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        extra = record.pop(None, None)  # cells beyond the header
+        if extra:
+            yield InvalidRecord(f"line {reader.line_num}: {len(extra)} more fields than the header", record)
+        else:
+            yield record
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield InvalidRecord(f"line {number}: invalid JSON: {exc}")
+            continue
+        yield record if isinstance(record, dict) else InvalidRecord(f"line {number}: expected a JSON object")
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = None
+
+    def write(self, record, error=None):
+        if self.writer is None:
+            fieldnames = [key for key in record if key not in ("value", "error")] + ["value", "error"]
+            self.writer = csv.DictWriter(self.stream, fieldnames=fieldnames, lineterminator="\n",
+                                         extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerow({**record, "error": error})
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record, error=None):
+        record = {key: json_safe(value) for key, value in record.items()}
+        if error is not None:
+            record["error"] = error
+        self.stream.write(json.dumps(record, allow_nan=False) + "\n")
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter}
+
+
+def detect_format(path, default="csv"):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    return default
+
+
+# ──────────────────────────  Pipeline  ──────────────────────────
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Throughput:
+    def __init__(self, stream=sys.stderr, interval=2.0):
+        self.stream = stream
+        self.interval = interval
+        self.rows = 0
+        self.start = self.last = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+        now = time.perf_counter()
+        if self.stream and now - self.last >= self.interval:
+            self.last = now
+            self.report("progress")
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def report(self, label="done"):
+        if self.stream:
+            elapsed = time.perf_counter() - self.start
+            print(f"{label}: {self.rows:,} rows in {elapsed:.2f}s ({self.rate:,.0f} rows/s)", file=self.stream)
+
+
+def value_stream(records, chunk_size=1000, workers=None, in_flight=None):
+    """Yield ``(record, value, error)`` triples in input order.
+
+    ``workers=1`` values everything in-process, which is handy for small
+    inputs and debugging.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = chunked(records, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from _triples(chunk, result_chunk(chunk))
+        return
+
+    in_flight = in_flight or workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(result_chunk, chunk)))
+            if len(pending) >= in_flight:
+                chunk, future = pending.popleft()
+                yield from _triples(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from _triples(chunk, future.result())
+
+
+def _triples(chunk, results):
+    for record, (value, error) in zip(chunk, results):
+        yield record, value, error
+
+
+def run(source, sink, input_format="csv", output_format=None, chunk_size=1000, workers=None, progress=sys.stderr):
+    writer = WRITERS[output_format or input_format](sink)
+    throughput = Throughput(progress)
+    for record, value, error in value_stream(READERS[input_format](source), chunk_size, workers):
+        writer.write({**record, "value": value}, error)
+        throughput.add(1)
+    throughput.report()
+    return throughput
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Value a CSV or JSON-lines pet catalog.")
+    parser.add_argument("input", nargs="?", default="-", help="input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=READERS, help="input format (default: from extension, else csv)")
+    parser.add_argument("--output-format", choices=WRITERS, help="output format (default: input format)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't report throughput")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or detect_format(args.input)
+    output_format = args.output_format or (detect_format(args.output, input_format) if args.output != "-" else input_format)
+    source = sys.stdin if args.input == "-" else open(args.input, newline="")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        run(source, sink, input_format, output_format, args.chunk_size, args.workers,
+            progress=None if args.quiet else sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
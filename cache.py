@@ -0,0 +1,193 @@
+"""Memoised valuations: an in-process LRU in front of an optional sqlite store.
+
+Keys are built from the inputs the pet type's formula actually reads, with
+numbers canonicalised to floats (so ``5``, ``5.0`` and ``Decimal("5")`` hit
+the same entry).  The on-disk tier is tagged with ``engine.FORMULA_VERSION``
+and wiped when it changes.  Importing this module builds nothing: callers
+own their ``ValuationCache`` (the app shares one across sessions).
+
+    cache = ValuationCache(path="valuations.sqlite")
+    cache.calculate_value("Shop", "shiny", price=1000, demand=5, c=0.3)
+    cache.stats()
+"""
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import engine
+import formulas
+import instrument
+
+# Inputs each pet type's formula depends on (besides type and variant),
+# as read off the formula declarations.
+BRANCH_FIELDS = formulas.WEB.fields
+
+MISSING = object()
+
+
+def canonical_number(value):
+    if value is None:
+        return None
+    value = float(value)
+    if value != value:
+        return "nan"
+    return value + 0.0  # folds -0.0 into 0.0
+
+
+def make_key(type_input, variant_input, **params):
+    """Normalised, hashable cache key for a ``calculate_value`` call."""
+    if params.get("variant_multi") is None:
+        params["variant_multi"] = engine.variant_multipliers.get(variant_input, 1)
+    key = [type_input, variant_input]
+    for name in BRANCH_FIELDS.get(type_input, ()):
+        value = params.get(name)
+        key.append(value if name == "availability" else canonical_number(value))
+    return tuple(key)
+
+
+class LRUCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return MISSING
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class DiskCache:
+    """sqlite-backed tier, evicting least recently used rows past ``max_entries``."""
+
+    def __init__(self, path, max_entries=1_000_000, version=engine.FORMULA_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self.hits = self.misses = self.evictions = 0
+        self.tick = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS valuations (key TEXT PRIMARY KEY, value REAL, used INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS valuations_used ON valuations (used)")
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'formula_version'").fetchone()
+        if row is None or row[0] != str(version):
+            self.db.execute("DELETE FROM valuations")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('formula_version', ?)", (str(version),))
+        self.tick = self.db.execute("SELECT COALESCE(MAX(used), 0) FROM valuations").fetchone()[0]
+        self.size = self.db.execute("SELECT COUNT(*) FROM valuations").fetchone()[0]
+        self.db.commit()
+
+    def _next_tick(self):
+        self.tick += 1
+        return self.tick
+
+    def get(self, key):
+        key = json.dumps(key)
+        row = self.db.execute("SELECT value FROM valuations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return MISSING
+        self.db.execute("UPDATE valuations SET used = ? WHERE key = ?", (self._next_tick(), key))
+        self.db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, value):
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO valuations VALUES (?, ?, ?)", (json.dumps(key), value, self._next_tick())
+        )
+        self.size += cursor.rowcount
+        if self.size > self.max_entries:
+            # Evict in batches so inserts past the limit don't each pay for a DELETE.
+            excess = self.size - self.max_entries + max(1, self.max_entries // 10)
+            cursor = self.db.execute(
+                "DELETE FROM valuations WHERE key IN (SELECT key FROM valuations ORDER BY used LIMIT ?)",
+                (excess,),
+            )
+            self.size -= cursor.rowcount
+            self.evictions += cursor.rowcount
+        self.db.commit()
+
+    def clear(self):
+        self.db.execute("DELETE FROM valuations")
+        self.db.commit()
+        self.size = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __len__(self):
+        return self.size
+
+
+class ValuationCache:
+    def __init__(self, maxsize=4096, path=None, max_disk_entries=1_000_000, version=engine.FORMULA_VERSION):
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskCache(path, max_disk_entries, version) if path else None
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.memory.get(key)
+            if value is MISSING and self.disk is not None:
+                value = self.disk.get(key)
+                if value is not MISSING:
+                    self.memory.put(key, value)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.memory.put(key, value)
+            if self.disk is not None:
+                self.disk.put(key, value)
+
+    def calculate_value(self, type_input, variant_input, **params):
+        with instrument.stage("cache", type_input):
+            key = make_key(type_input, variant_input, **params)
+            value = self.get(key)
+        if value is MISSING:
+            instrument.count("cache.miss", type_input)
+            value = engine.calculate_value(type_input, variant_input, **params)
+            self.put(key, value)
+        else:
+            instrument.count("cache.hit", type_input)
+        return value
+
+    def stats(self):
+        tiers = {"memory": self.memory}
+        if self.disk is not None:
+            tiers["disk"] = self.disk
+        return {
+            name: {"hits": tier.hits, "misses": tier.misses, "evictions": tier.evictions, "size": len(tier)}
+            for name, tier in tiers.items()
+        }
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.disk is not None:
+                self.disk.clear()
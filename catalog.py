@@ -0,0 +1,364 @@
+"""Memory-mapped columnar pet catalog with incremental revaluation.
+
+A catalog is a single ``.npy`` file holding one fixed-width NumPy
+structured record per pet: its name, type/variant codes, availability, the
+numeric valuation inputs and the last computed ``value``.  Opening one maps
+the file instead of reading it, so even a 1M-row catalog opens instantly and
+pages are only loaded when touched.
+
+Deltas (hourly ``exist`` changes, new pets) are applied with ``apply``:
+only the changed rows are rewritten and revalued, and new pets are appended
+to the end of the file.
+
+    python catalog.py create pets.csv pets.npy
+    python catalog.py apply pets.npy delta.jsonl
+    python catalog.py bench --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import bulk
+from batch import calculate_values
+from engine import variant_multipliers
+
+# Codes are stored on disk: only ever append to these lists.
+TYPES = ["Permanent", "Limited", "Rift", "Legendary Pass", "Secret Pass", "Shop"]
+VARIANTS = list(variant_multipliers)
+
+NAME_BYTES = 40
+
+NUMERIC_FIELDS = ["exist", "rarity", "demand", "c", "price", "variant_multi", "island_chance"]
+
+DTYPE = np.dtype(
+    [("name", f"S{NAME_BYTES}"), ("type", "u1"), ("variant", "u1"), ("obtainable", "?")]
+    + [(field, "f8") for field in NUMERIC_FIELDS]
+    + [("value", "f8")]
+)
+
+CHUNK_SIZE = 65_536
+
+_type_names = np.array(TYPES, dtype=object)
+_variant_names = np.array(VARIANTS, dtype=object)
+_availabilities = np.array(["Limited", "Still Obtainable"], dtype=object)
+_HEADERS = {
+    (1, 0): (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0),
+    (2, 0): (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0),
+}
+_type_codes = {name: i for i, name in enumerate(TYPES)}
+_variant_codes = {name: i for i, name in enumerate(VARIANTS)}
+
+
+# ──────────────────────────  Rows  ──────────────────────────
+def _encode_name(name):
+    encoded = str(name).encode("utf-8")
+    if len(encoded) > NAME_BYTES:
+        raise ValueError(f"Pet name longer than {NAME_BYTES} bytes: {name!r}")
+    return encoded
+
+
+def _set_fields(row, kwargs):
+    """Write ``bulk.record_kwargs`` output into one structured row."""
+    for name, value in kwargs.items():
+        if name == "type_input":
+            row["type"] = _code(_type_codes, value, "pet type")
+        elif name == "variant_input":
+            row["variant"] = _code(_variant_codes, value, "variant")
+        elif name == "availability":
+            row["obtainable"] = value == "Still Obtainable"
+        else:
+            row[name] = value
+
+
+def _code(codes, value, what):
+    try:
+        return codes[value]
+    except KeyError:
+        raise ValueError(f"Unknown {what}: {value!r}") from None
+
+
+def new_rows(records):
+    """Structured rows (unvalued) for name-keyed input records."""
+    kwargs = [bulk.record_kwargs(record) for record in records]
+    for record, fields in zip(records, kwargs):
+        if "type_input" not in fields:
+            raise ValueError(f"Record for new pet {record.get('name')!r} has no type")
+    rows = np.zeros(len(records), dtype=DTYPE)
+    rows["name"] = [_encode_name(record["name"]) for record in records]
+    rows["type"] = [_code(_type_codes, fields["type_input"], "pet type") for fields in kwargs]
+    rows["variant"] = [_code(_variant_codes, fields.get("variant_input", "normal"), "variant") for fields in kwargs]
+    rows["obtainable"] = [fields.get("availability") == "Still Obtainable" for fields in kwargs]
+    for field in NUMERIC_FIELDS:
+        rows[field] = [fields.get(field, np.nan) for fields in kwargs]
+    rows["value"] = np.nan
+    return rows
+
+
+def value_rows(rows):
+    """Web-formula values for a block of structured rows."""
+    return calculate_values(
+        _type_names[rows["type"]],
+        _variant_names[rows["variant"]],
+        availability=_availabilities[rows["obtainable"].astype(np.intp)],
+        **{field: rows[field] for field in NUMERIC_FIELDS},
+    )
+
+
+# ──────────────────────────  Catalog  ──────────────────────────
+class Catalog:
+    def __init__(self, path, mode="r+"):
+        self.path = path
+        self.mode = mode
+        self.rows = np.load(path, mmap_mode=mode)
+        if self.rows.dtype != DTYPE:
+            raise ValueError(f"{path} is not a pet catalog (dtype {self.rows.dtype})")
+        self._index = None
+        self._matcher = None
+        self._lock = threading.Lock()
+        # Objects with a ``changed(rows, before, after)`` method, told about
+        # every revalued row (``before`` is None for appended rows), and a
+        # ``reset()`` method, called instead when every row is revalued.
+        self.listeners = []
+
+    @classmethod
+    def create(cls, path, records, chunk_size=CHUNK_SIZE):
+        """Write a new catalog from name-keyed records and value every row."""
+        blocks = []
+        for chunk in bulk.chunked(records, chunk_size):
+            block = new_rows(chunk)
+            block["value"] = value_rows(block)
+            blocks.append(block)
+        rows = np.concatenate(blocks) if blocks else np.zeros(0, dtype=DTYPE)
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=DTYPE, shape=rows.shape)
+        out[:] = rows
+        out.flush()
+        del out
+        return cls(path)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def index(self):
+        """``{name: row}``, built on first use (it reads the whole name column)."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    names = self.rows["name"].tolist()
+                    self._index = {name.decode("utf-8"): i for i, name in enumerate(names)}
+        return self._index
+
+    @property
+    def matcher(self):
+        """``matcher.Matcher`` over the pet names, built on first use."""
+        if self._matcher is None:
+            index = self.index
+            with self._lock:
+                if self._matcher is None:
+                    from matcher import Matcher
+                    self._matcher = Matcher(index)
+        return self._matcher
+
+    def record(self, row):
+        row = self.rows[row]
+        return {
+            "name": row["name"].decode("utf-8"),
+            "type": TYPES[row["type"]],
+            "variant": VARIANTS[row["variant"]],
+            "availability": _availabilities[int(row["obtainable"])],
+            **{field: float(row[field]) for field in NUMERIC_FIELDS if not np.isnan(row[field])},
+            "value": float(row["value"]),
+        }
+
+    def values(self):
+        return self.rows["value"]
+
+    def update(self, rows, **columns):
+        """Set ``columns`` (scalars or arrays aligned with ``rows``) on the
+        given row indices and revalue just those rows.  A row listed more
+        than once takes its last values."""
+        rows = np.asarray(rows, dtype=np.intp)
+        # Last occurrence of each row, in the order given.
+        _, last = np.unique(rows[::-1], return_index=True)
+        keep = np.sort(len(rows) - 1 - last)
+        if len(keep) < len(rows):
+            rows = rows[keep]
+            columns = {field: value if np.ndim(value) == 0 else np.asarray(value)[keep]
+                       for field, value in columns.items()}
+        block = self.rows[rows]
+        before = block.copy() if self.listeners else None
+        for field, value in columns.items():
+            if field in ("name", "value") or field not in DTYPE.names:
+                raise ValueError(f"Cannot update field {field!r}")
+            block[field] = value
+        block["value"] = value_rows(block)
+        self._write(rows, before, block)
+        return len(rows)
+
+    def apply(self, records):
+        """Apply a delta of name-keyed records.
+
+        Known pets get the record's fields updated and are revalued; unknown
+        pets are appended.  Later records for the same name win.  Returns
+        ``(updated, added)`` row counts.
+        """
+        changes, added = {}, {}
+        index = self.index
+        for record in records:
+            name = str(record["name"])
+            target = changes if name in index else added
+            target.setdefault(name, {}).update(record)
+
+        if changes:
+            rows = np.fromiter((index[name] for name in changes), dtype=np.intp, count=len(changes))
+            block = self.rows[rows]
+            before = block.copy() if self.listeners else None
+            for row, record in zip(block, changes.values()):
+                _set_fields(row, bulk.record_kwargs(record))
+            block["value"] = value_rows(block)
+            self._write(rows, before, block)
+
+        if added:
+            block = new_rows(list(added.values()))
+            block["value"] = value_rows(block)
+            self._append(block)
+        return len(changes), len(added)
+
+    def _write(self, rows, before, after):
+        self.rows[rows] = after
+        self.rows.flush()
+        for listener in self.listeners:
+            listener.changed(rows, before, after)
+
+    def _append(self, block):
+        """Append rows to the file and grow the shape in its header.
+
+        NumPy pads ``.npy`` headers so the row count can grow in place."""
+        start = len(self.rows)
+        self.rows.flush()
+        self.rows = None
+        with open(self.path, "r+b") as f:
+            version = np.lib.format.read_magic(f)
+            read_header, write_header = _HEADERS[version]
+            shape, fortran_order, dtype = read_header(f)
+            data_offset = f.tell()
+            f.seek(0)
+            write_header(f, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                             "shape": (shape[0] + len(block),)})
+            if f.tell() != data_offset:
+                raise RuntimeError(f"{self.path}: header no longer fits, rewrite the catalog with create()")
+            f.seek(0, os.SEEK_END)
+            f.write(block.tobytes())
+        self.rows = np.load(self.path, mmap_mode=self.mode)
+        if self._index is not None:
+            for i, name in enumerate(block["name"].tolist(), start):
+                self._index[name.decode("utf-8")] = i
+        self._matcher = None
+        for listener in self.listeners:
+            listener.changed(np.arange(start, start + len(block)), None, block)
+
+    def revalue(self, chunk_size=CHUNK_SIZE):
+        """Recompute every value (after a formula change), one chunk at a time."""
+        for listener in self.listeners:
+            listener.reset()
+        for start in range(0, len(self.rows), chunk_size):
+            block = self.rows[start:start + chunk_size]
+            block["value"] = value_rows(block)
+        self.rows.flush()
+
+
+# ──────────────────────────  Benchmark  ──────────────────────────
+def synthetic_records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    types = rng.integers(0, len(TYPES), n)
+    variants = rng.integers(0, len(VARIANTS), n)
+    obtainable = rng.integers(0, 2, n)
+    columns = dict(
+        exist=rng.integers(1, 5_000, n), rarity=rng.uniform(1, 1e6, n), demand=rng.integers(1, 21, n),
+        c=rng.uniform(0.01, 3, n), price=rng.integers(1, 100_000, n), island_chance=rng.uniform(0.1, 100, n),
+    )
+    for i in range(n):
+        yield {
+            "name": f"pet-{i}",
+            "type": TYPES[types[i]],
+            "variant": VARIANTS[variants[i]],
+            "availability": _availabilities[obtainable[i]],
+            **{field: values[i].item() for field, values in columns.items()},
+        }
+
+
+def benchmark(rows=1_000_000, delta=10_000, out=print):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pets.npy")
+        start = time.perf_counter()
+        Catalog.create(path, synthetic_records(rows))
+        out(f"create {rows:,} rows: {time.perf_counter() - start:.2f}s, {os.path.getsize(path) / 2**20:,.1f} MiB")
+
+        start = time.perf_counter()
+        catalog = Catalog(path)
+        out(f"open: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        rng = np.random.default_rng(1)
+        changed = rng.choice(rows, delta, replace=False)
+        start = time.perf_counter()
+        catalog.update(changed, exist=rng.integers(1, 5_000, delta))
+        out(f"update {delta:,} rows by index: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        catalog.index
+        out(f"build name index: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        records = [{"name": f"pet-{i}", "exist": int(e)} for i, e in zip(changed, rng.integers(1, 5_000, delta))]
+        records += [{**record, "name": f"new-{i}"} for i, record in enumerate(synthetic_records(100, seed=2))]
+        start = time.perf_counter()
+        updated, added = catalog.apply(records)
+        out(f"apply {updated:,} updates + {added:,} new pets: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        catalog.revalue()
+        out(f"full revalue: {time.perf_counter() - start:.2f}s")
+        del catalog
+
+
+# ──────────────────────────  CLI  ──────────────────────────
+def _read(path):
+    input_format = bulk.detect_format(path)
+    with open(path, newline="") as f:
+        records = list(bulk.READERS[input_format](f))
+    for record in records:
+        if isinstance(record, bulk.InvalidRecord):
+            raise SystemExit(f"{path}: {record.error}")
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped pet catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="build a catalog from a CSV or JSON-lines file")
+    create.add_argument("input")
+    create.add_argument("catalog")
+    apply = commands.add_parser("apply", help="apply a CSV or JSON-lines delta to a catalog")
+    apply.add_argument("catalog")
+    apply.add_argument("delta")
+    bench = commands.add_parser("bench", help="time create/open/update on a synthetic catalog")
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    bench.add_argument("--delta", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        catalog = Catalog.create(args.catalog, _read(args.input))
+        print(f"{len(catalog):,} pets written to {args.catalog}", file=sys.stderr)
+    elif args.command == "apply":
+        updated, added = Catalog(args.catalog).apply(_read(args.delta))
+        print(f"{updated:,} pets updated, {added:,} added", file=sys.stderr)
+    else:
+        benchmark(args.rows, args.delta)
+
+
+if __name__ == "__main__":
+    main()
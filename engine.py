@@ -0,0 +1,162 @@
+"""Numeric valuation engine shared by PetCalculator.py and Calc.py.
+
+Every valuation formula integrates an integrand that is either constant in x
+or of the form ``(1 ± exp(-c x)) / c`` (optionally weighted by x), so the
+integrals have simple antiderivatives.  The formulas are declared once in
+``formulas.py`` and evaluated here with plain floats and ``math`` (with an
+mpmath fallback for ill-conditioned inputs, see ``precision.py``); the
+original sympy derivation lives in ``reference.py`` and can be selected with
+``backend="sympy"`` (or ``PETCALC_BACKEND=sympy``) to cross-check results.
+"""
+import os
+
+import formulas
+import instrument
+import precision
+from formulas import SAFE_LOWER, cli_variant_multipliers, variant_multipliers
+
+BACKEND = os.environ.get("PETCALC_BACKEND", "float")
+
+# Digest of the web formula declarations: changes whenever a formula does,
+# which invalidates cached valuations.
+FORMULA_VERSION = formulas.WEB.version
+
+
+def _resolve_backend(backend):
+    backend = backend or BACKEND
+    if backend not in ("float", "sympy"):
+        raise ValueError(f"Unknown backend: {backend!r}")
+    return backend
+
+
+# (set name, type, variant, obtainable) -> (checked float function, set, formula index, multiplier)
+_dispatch = {}
+
+
+def _entry(formula_set, type_input, variant_input, availability):
+    registry = formulas.SETS[formula_set]
+    if variant_input not in registry.multipliers:
+        variant_input = None  # as FormulaSet.resolve: one entry for every unknown variant
+    key = (formula_set, type_input, variant_input, availability == "Still Obtainable")
+    entry = _dispatch.get(key)
+    if entry is None:
+        index = registry.resolve(type_input, variant_input, availability)
+        if index is None:
+            return None
+        function = registry.compiled("math", checked=True)[index]
+        entry = _dispatch[key] = (function, registry, index, registry.multipliers.get(variant_input, 1))
+    return entry
+
+
+def value(formula_set, type_input, variant_input, exist=None, rarity=None, demand=None, c=None, price=None,
+          variant_multi=None, island_chance=None, availability=None):
+    """Value a pet with the named formula set ("web" or "cli").
+
+    Computed in float64, falling back to mpmath when ``precision`` judges
+    the float result unreliable.  Returns a float, or None when no formula
+    in the set applies.
+    """
+    entry = _entry(formula_set, type_input, variant_input, availability)
+    if entry is None:
+        return None
+    function, formula_set, index, multiplier = entry
+    # Inputs may be Decimal (the app passes some); the formulas need floats.
+    args = (
+        None if exist is None else float(exist),
+        None if rarity is None else float(rarity),
+        None if demand is None else float(demand),
+        None if c is None else float(c),
+        None if price is None else float(price),
+        multiplier if variant_multi is None else float(variant_multi),
+        None if island_chance is None else float(island_chance),
+        multiplier,
+    )
+    try:
+        result, condition = function(*args)
+    except OverflowError:
+        reason = "overflow"
+    else:
+        reason = precision.check(formula_set.formulas[index], result, condition, args[3])
+        if reason is None:
+            return result
+    return precision.recompute(formula_set, index, args, reason)
+
+
+# ──────────────────────────  Web model  ──────────────────────────
+def calculate_value(
+        type_input,
+        variant_input,
+        exist=None,
+        rarity=None,
+        demand=None,
+        c=None,
+        price=None,
+        variant_multi=None,
+        island_chance=None,
+        availability=None,
+        backend=None,
+):
+    """Value a pet with the PetCalculator.py formulas.
+
+    Returns a float, or None for an unknown pet type.
+    """
+    # Checked inline rather than via instrument.timed_valuation: re-packing
+    # keyword arguments in a wrapper costs as much as the formula itself.
+    args = (type_input, variant_input, exist, rarity, demand, c, price, variant_multi, island_chance,
+            availability, backend)
+    if instrument.enabled:
+        branch = variant_input if variant_input in variant_multipliers else "other"
+        with instrument.stage("engine", f"{type_input}/{branch}"):
+            return _calculate_value(*args)
+    return _calculate_value(*args)
+
+
+def _calculate_value(type_input, variant_input, exist, rarity, demand, c, price, variant_multi, island_chance,
+                     availability, backend):
+    if (backend or BACKEND) != "float" and _resolve_backend(backend) == "sympy":
+        import reference
+        if variant_multi is None:
+            variant_multi = variant_multipliers.get(variant_input, 1)
+        return reference.calculate_value(
+            type_input, variant_input, exist=exist, rarity=rarity, demand=demand,
+            c=c, price=price, variant_multi=variant_multi,
+            island_chance=island_chance, availability=availability,
+        )
+    return value("web", type_input, variant_input, exist, rarity, demand, c, price, variant_multi,
+                 island_chance, availability)
+
+
+# ──────────────────────────  CLI model  ──────────────────────────
+def cli_value(
+        type_input,
+        variant_input,
+        exist=None,
+        rarity=None,
+        demand=None,
+        c=None,
+        price=None,
+        variant_multi=None,
+        backend=None,
+):
+    """Value a pet with the Calc.py formulas.
+
+    Returns a float, or None for an unknown type/variant combination.
+    """
+    args = (type_input, variant_input, exist, rarity, demand, c, price, variant_multi, backend)
+    if instrument.enabled:
+        branch = variant_input if variant_input in cli_variant_multipliers else "other"
+        with instrument.stage("engine.cli", f"{type_input}/{branch}"):
+            return _cli_value(*args)
+    return _cli_value(*args)
+
+
+def _cli_value(type_input, variant_input, exist, rarity, demand, c, price, variant_multi, backend):
+    if (backend or BACKEND) != "float" and _resolve_backend(backend) == "sympy":
+        import reference
+        if variant_multi is None:
+            variant_multi = cli_variant_multipliers.get(variant_input, 1)
+        return reference.cli_value(
+            type_input, variant_input, exist=exist, rarity=rarity, demand=demand,
+            c=c, price=price, variant_multi=variant_multi,
+        )
+    return value("cli", type_input, variant_input, exist, rarity, demand, c, price, variant_multi)
@@ -0,0 +1,361 @@
+"""Formula registry shared by every entry point.
+
+Each valuation formula is declared exactly once, as data: the pet types and
+variants it applies to, whether it needs the pet to be "Still Obtainable",
+a few named sub-expressions (``let``) and the final expression.  A
+``FormulaSet`` compiles its declarations into plain Python functions the
+first time they are needed, once per numeric namespace: ``"math"`` for
+scalar valuations (``engine``), ``"numpy"`` for array valuations
+(``batch``, ``sweep``) and ``"mpmath"`` for the high-precision fallback
+(``precision``).  Checked builds also return how badly the final
+``i1 - i2`` subtraction cancels, see ``condition``.
+
+Two versioned sets exist side by side: ``WEB`` (PetCalculator.py) and
+``CLI`` (Calc.py).  A set's ``version`` is a digest of its declarations,
+multipliers and helpers, so any formula change invalidates cached
+valuations without a manual bump.  ``FormulaSet.fields`` lists the inputs
+(and ``availability``) each pet type's formulas read; cache keys and the
+callers that enumerate availabilities derive from it.
+
+Every integral in the formulas has a closed form, provided here as
+``const_integral``, ``decay_integral`` and ``weighted_decay_integral``.
+"""
+import hashlib
+import math
+import threading
+
+SAFE_LOWER = 1e-6  # Rift lower bound, prevents divide by zero
+
+# Compiled functions take these arguments, in this order.
+INPUTS = ("exist", "rarity", "demand", "c", "price", "variant_multi", "island_chance", "multiplier")
+
+NORMAL = ("normal",)
+
+AVAILABILITIES = ("Still Obtainable", "Limited")
+
+MPMATH_DIGITS = 50
+
+# ───────────────────────  Variant multipliers  ─────────────────────
+# Web app (PetCalculator.py)
+variant_multipliers = {
+    "normal": 1,
+    "shiny": 40,
+    "mythic": 80,
+    "shiny mythic": 400,
+}
+
+# Interactive CLI (Calc.py)
+cli_variant_multipliers = {
+    "normal": 1,
+    "shiny": 40,
+    "mythic": 80,
+    "shiny mythic": 320,
+}
+
+
+# ──────────────────────────  Namespaces  ──────────────────────────
+def condition(a, b):
+    """Factor by which ``a - b`` amplifies the relative error of ``a`` and ``b``."""
+    difference = abs(a - b)
+    if not difference:
+        return math.inf if a else 1.0
+    return (abs(a) + abs(b)) / difference
+
+
+def _array_condition(a, b):
+    return (abs(a) + abs(b)) / abs(a - b)
+
+
+def _namespace(sqrt, exp, cbrt, condition):
+    def const_integral(k, lower, upper):
+        """∫ sqrt(k) dx from lower to upper."""
+        return sqrt(k) * (upper - lower)
+
+    def const_integral_step(k, exist, lower=0):
+        """const_integral(k / (exist + 1), lower, exist + 1) - const_integral(k / exist, lower, exist),
+        rearranged so that nothing cancels for large ``exist``."""
+        root, next_root = sqrt(exist), sqrt(exist + 1)
+        return sqrt(k) / (next_root + root) * (1 + lower / (root * next_root))
+
+    def decay_integral(c, lower, upper, sign=-1):
+        """∫ (1 + sign * exp(-c x)) / c dx from lower to upper."""
+        def antiderivative(x):
+            return (x - sign * exp(-c * x) / c) / c
+
+        return antiderivative(upper) - antiderivative(lower)
+
+    def weighted_decay_integral(c, lower, upper):
+        """∫ x (1 - exp(-c x)) / c dx from lower to upper."""
+        def antiderivative(x):
+            return (x * x / 2 + exp(-c * x) * (c * x + 1) / (c * c)) / c
+
+        return antiderivative(upper) - antiderivative(lower)
+
+    def demand_factor(demand, factor):
+        return 1 + factor * exp(0.25 * demand)
+
+    return {
+        "sqrt": sqrt,
+        "exp": exp,
+        "cbrt": cbrt,
+        "condition": condition,
+        "const_integral": const_integral,
+        "const_integral_step": const_integral_step,
+        "decay_integral": decay_integral,
+        "weighted_decay_integral": weighted_decay_integral,
+        "demand_factor": demand_factor,
+        "SAFE_LOWER": SAFE_LOWER,
+    }
+
+
+def _numpy_namespace():
+    import numpy as np
+    return _namespace(np.sqrt, np.exp, np.cbrt, _array_condition)
+
+
+def _mpmath_namespace():
+    # A private context: changing the global mpmath precision would race
+    # with other threads.
+    import mpmath
+    context = mpmath.MPContext()
+    context.dps = MPMATH_DIGITS
+    scope = _namespace(context.sqrt, context.exp, context.cbrt, condition)
+    scope["mpf"] = context.mpf
+    return scope
+
+
+NAMESPACES = {
+    "math": lambda: _namespace(math.sqrt, math.exp, math.cbrt, condition),
+    "numpy": _numpy_namespace,
+    "mpmath": _mpmath_namespace,
+}
+
+_namespaces = {}
+
+# Scopes and compiled functions are shared by every thread (each Streamlit
+# session runs in its own); this guards building them.
+_build_lock = threading.RLock()
+
+
+def helpers(namespace):
+    """The shared helper scope for a numeric namespace, built on first use."""
+    scope = _namespaces.get(namespace)
+    if scope is None:
+        with _build_lock:
+            scope = _namespaces.get(namespace)
+            if scope is None:
+                scope = _namespaces[namespace] = NAMESPACES[namespace]()
+    return scope
+
+
+# ──────────────────────────  Declarations  ──────────────────────────
+class Formula:
+    """One formula, applying to ``types`` x ``variants`` (None = any).
+
+    ``obtainable`` restricts it to pets that are (True) or are not (False)
+    "Still Obtainable"; None applies either way.  Declarations are matched
+    in order, so put the specific ones first.
+    """
+
+    def __init__(self, types, value, variants=None, obtainable=None, let=()):
+        self.types = tuple(types)
+        self.variants = variants
+        self.obtainable = obtainable
+        self.let = tuple(let)
+        self.value = value
+        names = set()
+        for expression in [value, *(expression for _, expression in self.let)]:
+            names.update(compile(expression, "<formula>", "eval").co_names)
+        self.reads = frozenset(names.intersection(INPUTS))
+
+    def matches(self, type_input, variant_input, obtainable):
+        return (
+            type_input in self.types
+            and (self.variants is None or variant_input in self.variants)
+            and (self.obtainable is None or self.obtainable == obtainable)
+        )
+
+    def source(self, name, checked=False):
+        """Python source of the function; ``checked`` builds return
+        ``(value, condition(i1, i2))``."""
+        lines = [f"def {name}({', '.join(INPUTS)}):"]
+        lines += [f"    {target} = {expression}" for target, expression in self.let]
+        if not checked:
+            lines.append(f"    return {self.value}")
+        elif {"i1", "i2"} <= {target for target, _ in self.let}:
+            lines.append(f"    return {self.value}, condition(i1, i2)")
+        else:
+            lines.append(f"    return {self.value}, 1.0")
+        return "\n".join(lines)
+
+
+def _digest_code(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _digest_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+class FormulaSet:
+    def __init__(self, name, multipliers, formulas):
+        self.name = name
+        self.multipliers = multipliers
+        self.formulas = list(formulas)
+        self.types = {type_input for formula in self.formulas for type_input in formula.types}
+        self.fields = {type_input: self._fields(type_input) for type_input in sorted(self.types)}
+        self.version = self._version()
+        self._compiled = {}
+        self._resolved = {}
+
+    def _fields(self, type_input):
+        """Inputs (besides type and variant) the type's formulas read."""
+        formulas = [formula for formula in self.formulas if type_input in formula.types]
+        reads = set().union(*(formula.reads for formula in formulas))
+        fields = [name for name in INPUTS if name in reads and name != "multiplier"]
+        if any(formula.obtainable is not None for formula in formulas):
+            fields.append("availability")
+        return tuple(fields)
+
+    def _version(self):
+        digest = hashlib.sha256(repr(sorted(self.multipliers.items())).encode())
+        for formula in self.formulas:
+            declaration = (formula.types, formula.variants, formula.obtainable, formula.let, formula.value)
+            digest.update(repr(declaration).encode())
+        _digest_code(_namespace.__code__, digest)
+        digest.update(repr(SAFE_LOWER).encode())
+        return digest.hexdigest()[:12]
+
+    def resolve(self, type_input, variant_input, availability=None):
+        """Index of the formula for this pet, or None if no formula applies.
+
+        Variants the set has no multiplier for all resolve (and are cached)
+        as None, so arbitrary variant strings can't grow the cache."""
+        if variant_input not in self.multipliers:
+            variant_input = None
+        obtainable = availability == "Still Obtainable"
+        key = (type_input, variant_input, obtainable)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        index = next(
+            (i for i, formula in enumerate(self.formulas) if formula.matches(type_input, variant_input, obtainable)),
+            None,
+        )
+        if type_input in self.types:
+            self._resolved[key] = index
+        return index
+
+    def compiled(self, namespace="math", checked=False):
+        key = (namespace, checked)
+        functions = self._compiled.get(key)
+        if functions is None:
+            with _build_lock:
+                functions = self._compiled.get(key)
+                if functions is None:
+                    functions = self._compiled[key] = self._compile(namespace, checked)
+        return functions
+
+    def _compile(self, namespace, checked):
+        scope = helpers(namespace)
+        functions = []
+        for i, formula in enumerate(self.formulas):
+            name = f"{self.name}_{i}_{formula.types[0].replace(' ', '_').replace('-', '_')}"
+            if checked:
+                name += "_checked"
+            exec(compile(formula.source(name, checked), f"<formula {self.name}[{i}]>", "exec"), scope)
+            functions.append(scope[name])
+        return functions
+
+    def function(self, type_input, variant_input, availability=None, namespace="math", checked=False):
+        """Compiled callable taking ``INPUTS`` positionally, or None."""
+        index = self.resolve(type_input, variant_input, availability)
+        return None if index is None else self.compiled(namespace, checked)[index]
+
+
+# ──────────────────────────  Web model  ──────────────────────────
+_rift = [
+    ("k", "(rarity * multiplier) * (island_chance / 100)"),
+    ("d", "const_integral_step(k, exist, SAFE_LOWER)"),
+]
+_legendary_obtainable = [
+    ("i1", "decay_integral(c, 0, demand + 1, 1) / rarity"),
+    ("i2", "decay_integral(c, 0, demand, 1) / rarity"),
+]
+_legendary_limited = [
+    ("i1", "decay_integral(c, 0, demand + 1, -1) / rarity"),
+    ("i2", "decay_integral(c, 0, demand, -1) / rarity"),
+]
+_secret_normal = [("d", "const_integral_step(rarity ** 2, exist)")]
+_secret_variant = [("d", "const_integral_step((rarity * variant_multi) ** 2, exist)")]
+_shop = [
+    ("i1", "price * weighted_decay_integral(c, 0, demand + 1)"),
+    ("i2", "price * weighted_decay_integral(c, 0, demand)"),
+]
+
+WEB = FormulaSet("web", variant_multipliers, [
+    # The original branch chose 0.1 when type_input == "permanent", which never
+    # matches the capitalised type names, so both types have always used 0.25.
+    Formula(["Permanent", "Limited"], "2 * sqrt((rarity * multiplier) / exist) * demand_factor(demand, 0.25)"),
+
+    Formula(["Rift"], "2 * (d * demand_factor(demand, 0.1))", obtainable=True, let=_rift),
+    Formula(["Rift"], "2 * (d * demand_factor(demand, 0.25))", let=_rift),
+
+    Formula(["Legendary Pass"], "2 * (sqrt((i1 - i2) ** 2.5) * 0.1)",
+            variants=NORMAL, obtainable=True, let=_legendary_obtainable),
+    Formula(["Legendary Pass"], "2 * (sqrt((i1 - i2) ** 2.5 * (variant_multi / 3)) * 0.1)",
+            obtainable=True, let=_legendary_obtainable),
+    Formula(["Legendary Pass"], "2 * (sqrt((i1 - i2) ** 2.5) * 0.2)",
+            variants=NORMAL, let=_legendary_limited),
+    Formula(["Legendary Pass"], "2 * (sqrt((i1 - i2) ** 2.5 * (variant_multi / 3)) * 0.2)",
+            let=_legendary_limited),
+
+    Formula(["Secret Pass"], "2 * d * demand_factor(demand, 0.1)",
+            variants=NORMAL, obtainable=True, let=_secret_normal),
+    Formula(["Secret Pass"], "2 * d * demand_factor(demand, 0.25)",
+            variants=NORMAL, let=_secret_normal),
+    Formula(["Secret Pass"], "2 * (cbrt(d ** 2 * (variant_multi / 3)) * demand_factor(demand, 0.1))",
+            obtainable=True, let=_secret_variant),
+    Formula(["Secret Pass"], "2 * (cbrt(d ** 2 * (variant_multi / 3)) * demand_factor(demand, 0.25))",
+            let=_secret_variant),
+
+    Formula(["Shop"], "2 * (0.5 * sqrt((i1 - i2) ** 1.25))", variants=NORMAL, let=_shop),
+    Formula(["Shop"], "2 * sqrt(0.25 * (i1 - i2) ** 1.25 * variant_multi)", let=_shop),
+])
+
+# ──────────────────────────  CLI model  ──────────────────────────
+_cli_pass = [
+    ("i1", "decay_integral(c, 0, demand + 1) / rarity"),
+    ("i2", "decay_integral(c, 0, demand) / rarity"),
+]
+_cli_shop = [
+    ("i1", "price * decay_integral(c, 0, demand + 1)"),
+    ("i2", "price * decay_integral(c, 0, demand)"),
+]
+
+CLI = FormulaSet("cli", cli_variant_multipliers, [
+    Formula(["permenant", "limited"], "d * demand_factor(demand, 0.05)",
+            variants=tuple(cli_variant_multipliers), let=[
+                ("d", "const_integral_step(rarity * multiplier, exist)"),
+            ]),
+
+    Formula(["pass", "non-secret", "non secret"], "sqrt((i1 - i2) ** 3) / 2", variants=NORMAL, let=_cli_pass),
+    Formula(["pass", "non-secret", "non secret"], "0.5 * sqrt((i1 - i2) ** 3 * (variant_multi / 10))",
+            let=_cli_pass),
+
+    Formula(["shop"], "0.5 * sqrt((i1 - i2) ** 1.5)", variants=NORMAL, let=_cli_shop),
+    Formula(["shop"], "0.5 * sqrt((i1 - i2) ** 1.5 * (variant_multi / 10))", variants=("shiny",), let=_cli_shop),
+])
+
+SETS = {formula_set.name: formula_set for formula_set in [WEB, CLI]}
+
+
+def precompile(namespaces=("math", "numpy")):
+    """Compile every set's checked functions (the builds ``engine`` and
+    ``batch`` call) now rather than on the first valuation."""
+    for formula_set in SETS.values():
+        for namespace in namespaces:
+            formula_set.compiled(namespace, checked=True)
@@ -0,0 +1,262 @@
+"""Opt-in timing instrumentation for the valuation hot path.
+
+Off by default; enable with ``PETCALC_PROFILE=1`` or ``instrument.enable()``
+(the app's sidebar toggle, offered with ``PETCALC_DEV=1``, does this).
+While disabled, ``stage()`` returns a shared no-op context manager, so
+instrumented call sites only pay for one attribute check.
+
+    with instrument.stage("engine", "Shop/shiny"):
+        ...
+    instrument.summary()          # per stage/branch counts and percentiles
+
+Session profiles come in two flavours: ``profiled()`` wraps a block in
+cProfile (dump with ``dump_pstats``), and ``StackSampler`` samples every
+thread's stack for a collapsed-stack (flamegraph) profile.
+"""
+import atexit
+import contextlib
+import cProfile
+import functools
+import io
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+enabled = os.environ.get("PETCALC_PROFILE", "") not in ("", "0")
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = Counter()
+_profile = cProfile.Profile()
+_profiling = False
+_null = contextlib.nullcontext()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def disable():
+    enable(False)
+
+
+# ──────────────────────────  Histograms  ──────────────────────────
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets."""
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        self.buckets[max(0, math.ceil(math.log2(us))) if us > 1 else 0] += 1
+        self.count += 1
+        self.total += us
+        self.min = min(self.min, us)
+        self.max = max(self.max, us)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the ``pct`` percentile, in µs."""
+        target = pct / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2.0 ** bucket, self.max)
+        return self.max
+
+
+def record(stage_name, branch, seconds):
+    with _lock:
+        histogram = _histograms.get((stage_name, branch))
+        if histogram is None:
+            histogram = _histograms[(stage_name, branch)] = Histogram()
+        histogram.add(seconds)
+
+
+def count(name, branch="", n=1):
+    if enabled:
+        with _lock:
+            _counters[(name, branch)] += n
+
+
+class _Stage:
+    __slots__ = ("name", "branch", "start")
+
+    def __init__(self, name, branch):
+        self.name = name
+        self.branch = branch
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.branch, time.perf_counter() - self.start)
+
+
+def stage(name, branch=""):
+    """Time a block as ``name`` tagged with ``branch`` (no-op when disabled)."""
+    if not enabled:
+        return _null
+    return _Stage(name, branch)
+
+
+def timed_valuation(name):
+    """Decorate a ``(type_input, variant_input, ...)`` valuation function so
+    each call is recorded as stage ``name`` tagged ``type/variant``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(type_input, variant_input, *args, **kwargs):
+            if not enabled:
+                return func(type_input, variant_input, *args, **kwargs)
+            with _Stage(name, f"{type_input}/{variant_input}"):
+                return func(type_input, variant_input, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def summary():
+    """One row per (stage, branch) with count and latency stats in µs."""
+    with _lock:
+        rows = [
+            {
+                "stage": name,
+                "branch": branch,
+                "count": h.count,
+                "mean_us": h.total / h.count,
+                "min_us": h.min,
+                "p50_us": h.percentile(50),
+                "p99_us": h.percentile(99),
+                "max_us": h.max,
+                "total_ms": h.total / 1000,
+            }
+            for (name, branch), h in _histograms.items()
+        ]
+        counters = [{"counter": name, "branch": branch, "count": n} for (name, branch), n in _counters.items()]
+    rows.sort(key=lambda row: -row["total_ms"])
+    return rows, counters
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def report(stream=None):
+    """Print ``summary()`` as a table."""
+    stream = stream or sys.stderr
+    rows, counters = summary()
+    print(f"{'stage':<14} {'branch':<32} {'count':>8} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'total ms':>10}",
+          file=stream)
+    for row in rows:
+        print(
+            f"{row['stage']:<14} {row['branch']:<32} {row['count']:>8} {row['mean_us']:>10.1f} "
+            f"{row['p50_us']:>10.1f} {row['p99_us']:>10.1f} {row['total_ms']:>10.1f}",
+            file=stream,
+        )
+    for row in counters:
+        print(f"{row['counter']:<14} {row['branch']:<32} {row['count']:>8}", file=stream)
+
+
+if enabled:
+    # PETCALC_PROFILE=1 python bulk.py ... prints the stats on exit.
+    atexit.register(report)
+
+
+# ──────────────────────────  Profiles  ──────────────────────────
+@contextlib.contextmanager
+def profiled():
+    """Add the enclosed block to the session's cProfile data."""
+    global _profiling
+    with _lock:
+        if _profiling:
+            nested = True
+        else:
+            nested, _profiling = False, True
+    if nested:
+        yield
+        return
+    _profile.enable()
+    try:
+        yield
+    finally:
+        _profile.disable()
+        with _lock:
+            _profiling = False
+
+
+def pstats_text(sort="cumulative", limit=40):
+    out = io.StringIO()
+    try:
+        pstats.Stats(_profile, stream=out).sort_stats(sort).print_stats(limit)
+    except TypeError:  # nothing recorded yet
+        return ""
+    return out.getvalue()
+
+
+def dump_pstats(path):
+    _profile.dump_stats(path)
+
+
+def reset_profile():
+    global _profile
+    _profile = cProfile.Profile()
+
+
+class StackSampler:
+    """Sample every thread's Python stack into collapsed-stack counts.
+
+    The output of ``collapsed()`` is the ``frame;frame;frame count`` format
+    read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
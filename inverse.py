@@ -0,0 +1,117 @@
+"""Inverse valuations: the input value at which a pet is worth a target.
+
+    solve("Shop", "shiny", "price", 5e9, demand=12, c=0.35)
+    solve("Rift", "normal", "exist", [100, 1000], rarity=1e6, demand=12, island_chance=4.5)
+
+Each formula is monotonic in each of its inputs over the input's domain
+(``BOUNDS``), so the domain endpoints bracket every reachable target.  The
+root of ``log(value) - log(target)`` is then found by Newton's method on the
+log of the input, falling back to bisection whenever a step leaves the
+bracket.  All targets are solved together, one vectorised valuation
+per iteration, so batches cost about as much as a single target.
+Targets outside the range reachable within the bounds come back as NaN.
+"""
+import re
+
+import numpy as np
+
+import formulas
+from batch import calculate_values
+
+# Search domain per input.  Solving runs on the log of the input.
+BOUNDS = {
+    "exist": (1.0, 1e9),
+    "rarity": (1e-4, 1e100),
+    "demand": (1e-3, 1e6),
+    "c": (1e-4, 1e3),
+    "price": (1e-4, 1e100),
+    "variant_multi": (1e-4, 1e12),
+    "island_chance": (1e-4, 100.0),
+}
+
+SUFFIXES = {"k": 1e3, "m": 1e6, "b": 1e9, "t": 1e12}
+
+
+def unknowns(type_input, variant_input, availability=None, formula_set="web"):
+    """Inputs of this pet's formula that ``solve`` can solve for."""
+    index = formulas.SETS[formula_set].resolve(type_input, variant_input, availability)
+    if index is None:
+        return []
+    reads = formulas.SETS[formula_set].formulas[index].reads
+    return [name for name in BOUNDS if name in reads]
+
+
+def solve(type_input, variant_input, unknown, target, bounds=None, rtol=1e-12, max_iter=100, formula_set="web",
+          **inputs):
+    """Value of input ``unknown`` at which the pet is worth ``target``.
+
+    ``inputs`` are the other ``calculate_value`` arguments.  ``target`` may
+    be a scalar (returns a float) or an array (returns an array of the same
+    shape).  ``bounds`` overrides the ``(low, high)`` search domain, which
+    must be positive.
+    """
+    if unknown not in unknowns(type_input, variant_input, inputs.get("availability"), formula_set):
+        raise ValueError(f"Can't solve {type_input}/{variant_input} for {unknown!r}")
+    low, high = BOUNDS[unknown] if bounds is None else bounds
+
+    targets = np.asarray(target, dtype=float)
+    with np.errstate(all="ignore"):
+        log_targets = np.log(targets.ravel())
+
+    def log_value(u):
+        values = calculate_values(type_input, variant_input, formula_set=formula_set, **{**inputs, unknown: np.exp(u)})
+        with np.errstate(all="ignore"):
+            return np.log(np.broadcast_to(values, np.shape(u)))
+
+    def residual(u, rows):
+        return log_value(u) - log_targets[rows]
+
+    # Every target shares the bracket ends, so value them once.
+    n = log_targets.size
+    a = np.full(n, np.log(float(low)))
+    b = np.full(n, np.log(float(high)))
+    ga = log_value(a[:1]) - log_targets
+    gb = log_value(b[:1]) - log_targets
+    solution = np.full(n, np.nan)
+    solution[ga == 0] = a[ga == 0]
+    solution[gb == 0] = b[gb == 0]
+    active = np.flatnonzero((np.sign(ga) * np.sign(gb) < 0) & np.isnan(solution))
+
+    # Start from the secant through the bracket ends.
+    x = a - ga * (b - a) / (gb - ga)
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        xa, aa, ba, gaa = x[active], a[active], b[active], ga[active]
+        gx = residual(xa, active)
+
+        # Shrink the bracket around the root.
+        same = np.sign(gx) == np.sign(gaa)
+        a[active] = aa = np.where(same, xa, aa)
+        ga[active] = np.where(same, gx, gaa)
+        b[active] = ba = np.where(same, ba, xa)
+
+        step = 1e-7 * np.maximum(1.0, np.abs(xa))
+        slope = (residual(xa + step, active) - gx) / step
+        with np.errstate(all="ignore"):
+            newton = xa - gx / slope
+        inside = np.isfinite(newton) & (newton > np.minimum(aa, ba)) & (newton < np.maximum(aa, ba))
+        x[active] = np.where(inside, newton, (aa + ba) / 2)
+
+        converged = (np.abs(gx) <= rtol) | (np.abs(ba - aa) <= 1e-15 * np.maximum(1.0, np.abs(xa)))
+        solution[active[converged]] = xa[converged]
+        active = active[~converged & np.isfinite(gx)]
+
+    result = np.exp(solution).reshape(targets.shape)
+    return float(result) if result.ndim == 0 else result
+
+
+def parse_targets(text):
+    """Parse ``"5B, 250m, 1e9"`` into a list of floats."""
+    targets = []
+    for token in re.split(r"[,\s]+", text.strip()):
+        if not token:
+            continue
+        scale = SUFFIXES.get(token[-1].lower())
+        targets.append(float(token[:-1].replace("_", "")) * scale if scale else float(token.replace("_", "")))
+    return targets
@@ -0,0 +1,324 @@
+"""Load test: many concurrent browser sessions against the Streamlit app.
+
+Each simulated session talks to the app's websocket (``/_stcore/stream``)
+the way a browser tab does: it picks a pet type and variant from a weighted
+mix, fills in that type's inputs and presses "Calculate Value", every
+widget change being one script rerun.  A share of the pets repeat between
+sessions, like event traffic crowding onto the same few pets.
+
+Without ``--url`` the app is started with ``run.py`` on a free port and its
+CPU time and memory are read from ``/proc`` (Linux).  Reports reruns per
+second, rerun latency percentiles, and server CPU per rerun, the inverse
+of the rerun capacity of one core.
+
+Needs the ``websockets`` package.
+
+    python loadtest.py --sessions 20 --duration 30
+    python loadtest.py --url ws://localhost:8501 --sessions 50 --think 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from server import percentile
+
+# Relative traffic per pet type and variant.
+TYPE_MIX = {"Rift": 30, "Shop": 25, "Permanent": 15, "Limited": 10, "Legendary Pass": 10, "Secret Pass": 10}
+VARIANT_MIX = {"normal": 55, "shiny": 25, "mythic": 15, "shiny mythic": 5}
+
+# Share of actions valuing one of the popular pets every session shares.
+POPULAR_SHARE = 0.6
+POPULAR_PETS = 200
+
+CLICK_LABEL = "Calculate Value"
+TYPE_LABEL = "Select pet type"
+VARIANT_LABEL = "Select pet variant"
+
+
+# ──────────────────────────  Input mix  ──────────────────────────
+def random_inputs(rng):
+    """One pet's inputs, keyed by the word its widget label contains."""
+    return {
+        "exist": float(rng.randint(1, 5_000)),
+        "rarity": float(round(10 ** rng.uniform(2, 7), 4)),
+        "demand": float(rng.randint(1, 20)),
+        "island": round(rng.uniform(0.5, 50), 4),
+        "c value": round(rng.uniform(0.05, 2), 3),
+        "price": float(rng.randint(100, 100_000)),
+        "availability": rng.choice(["Still Obtainable", "Limited"]),
+    }
+
+
+def random_pet(rng):
+    type_input = rng.choices(list(TYPE_MIX), weights=list(TYPE_MIX.values()))[0]
+    variant = rng.choices(list(VARIANT_MIX), weights=list(VARIANT_MIX.values()))[0]
+    return type_input, variant, random_inputs(rng)
+
+
+def _widget_value(kind, value):
+    if kind == "selectbox":
+        return "string_value", value
+    if kind == "slider":
+        return "double_array_value", [value]
+    if kind == "button":
+        return "trigger_value", True
+    if kind == "checkbox":
+        return "bool_value", value
+    return "double_value", value
+
+
+# ──────────────────────────  Session  ──────────────────────────
+class Session:
+    """One browser tab: a websocket plus the widget state it has set."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.widgets = {}  # label -> (element kind, widget id)
+        self.states = {}   # widget id -> (field, value)
+
+    async def rerun(self, trigger=None):
+        """Send the widget states (plus a one-off button ``trigger``) and wait
+        for the script to finish.  Returns the number of exceptions shown."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.SetInParent()
+        states = dict(self.states)
+        if trigger is not None:
+            states[trigger] = ("trigger_value", True)
+        for widget_id, (field, value) in states.items():
+            state = client_state.widget_states.widgets.add()
+            state.id = widget_id
+            if field == "double_array_value":
+                state.double_array_value.data.extend(value)
+            else:
+                setattr(state, field, value)
+        await self.websocket.send(message.SerializeToString())
+
+        errors = 0
+        widgets = {}
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "script_finished":
+                break
+            if kind != "delta" or forward.delta.WhichOneof("type") != "new_element":
+                continue
+            element = forward.delta.new_element
+            element_kind = element.WhichOneof("type")
+            if element_kind == "exception":
+                errors += 1
+                continue
+            proto = getattr(element, element_kind)
+            widget_id = getattr(proto, "id", "")
+            if widget_id and hasattr(proto, "label"):
+                widgets[proto.label] = (element_kind, widget_id)
+        self.widgets = widgets
+        return errors
+
+    def set(self, label, value):
+        """Set the widget labelled ``label``; False if this rerun didn't show it."""
+        if label not in self.widgets:
+            return False
+        kind, widget_id = self.widgets[label]
+        self.states[widget_id] = _widget_value(kind, value)
+        return True
+
+    def fill(self, inputs):
+        for label in self.widgets:
+            for word, value in inputs.items():
+                if word in label.lower():
+                    self.set(label, value)
+
+
+async def run_session(url, deadline, think, seed, popular, stats):
+    import websockets
+
+    rng = random.Random(seed)
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as websocket:
+        session = Session(websocket)
+        started = time.perf_counter()
+        stats["errors"] += await session.rerun()
+        stats["latency"]["connect"].append(time.perf_counter() - started)
+
+        while time.perf_counter() < deadline:
+            type_input, variant, inputs = rng.choice(popular) if rng.random() < POPULAR_SHARE else random_pet(rng)
+            # Picking the type reruns the script and shows that type's inputs.
+            session.set(TYPE_LABEL, type_input)
+            session.set(VARIANT_LABEL, variant)
+            started = time.perf_counter()
+            stats["errors"] += await session.rerun()
+            stats["latency"]["select"].append(time.perf_counter() - started)
+
+            session.fill(inputs)
+            started = time.perf_counter()
+            stats["errors"] += await session.rerun(trigger=session.widgets[CLICK_LABEL][1])
+            stats["latency"]["calculate"].append(time.perf_counter() - started)
+            stats["valuations"] += 1
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+
+# ──────────────────────────  Server  ──────────────────────────
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port, env=None, timeout=60):
+    """Start the app with ``run.py`` headless on ``port`` and wait until it is healthy."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(here, "run.py"), "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        env={**os.environ, **(env or {})}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("the app exited during startup")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"the app didn't come up on port {port} within {timeout}s")
+
+
+def process_usage(pid):
+    """``(cpu seconds, rss bytes, peak rss bytes)`` of a process, or None
+    where ``/proc`` isn't available."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    return cpu, int(status["VmRSS"].split()[0]) * 1024, int(status["VmHWM"].split()[0]) * 1024
+
+
+# ──────────────────────────  Driver  ──────────────────────────
+async def drive(url, sessions, duration, think, ramp, seed):
+    rng = random.Random(seed)
+    popular = [random_pet(rng) for _ in range(POPULAR_PETS)]
+    stats = {"errors": 0, "valuations": 0, "failed_sessions": 0,
+             "latency": {"connect": [], "select": [], "calculate": []}}
+    deadline = time.perf_counter() + ramp + duration
+
+    async def staggered(i):
+        await asyncio.sleep(ramp * i / max(1, sessions))
+        try:
+            await run_session(url, deadline, think, seed + i + 1, popular, stats)
+        except Exception as e:
+            stats["failed_sessions"] += 1
+            print(f"session {i} failed: {e!r}", file=sys.stderr)
+
+    await asyncio.gather(*(staggered(i) for i in range(sessions)))
+    return stats
+
+
+def run(sessions=20, duration=30.0, think=0.5, ramp=2.0, url=None, pid=None, seed=0, catalog=None):
+    """Drive ``sessions`` concurrent sessions for ``duration`` seconds and
+    return a summary dict."""
+    process = None
+    if url is None:
+        port = _free_port()
+        process = start_app(port, {"PETCALC_CATALOG": catalog} if catalog else None)
+        url, pid = f"ws://127.0.0.1:{port}/_stcore/stream", process.pid
+    elif not url.rstrip("/").endswith("_stcore/stream"):
+        url = url.rstrip("/") + "/_stcore/stream"
+
+    try:
+        before = process_usage(pid) if pid else None
+        wall, client_cpu = time.perf_counter(), time.process_time()
+        stats = asyncio.run(drive(url, sessions, duration, think, ramp, seed))
+        wall, client_cpu = time.perf_counter() - wall, time.process_time() - client_cpu
+        after = process_usage(pid) if pid else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    reruns = sum(len(samples) for samples in stats["latency"].values())
+    summary = {
+        "sessions": sessions,
+        "seconds": wall,
+        "reruns": reruns,
+        "valuations": stats["valuations"],
+        "reruns_per_s": reruns / wall,
+        "errors": stats["errors"],
+        "failed_sessions": stats["failed_sessions"],
+        "client_cpu_s": client_cpu,
+        "latency_ms": {},
+    }
+    for name, samples in stats["latency"].items():
+        ordered = sorted(samples)
+        summary["latency_ms"][name] = {
+            "count": len(ordered),
+            **{f"p{p}": percentile(ordered, p) * 1000 for p in (50, 90, 99)},
+            "max": ordered[-1] * 1000 if ordered else 0.0,
+        }
+    if before and after:
+        cpu = after[0] - before[0]
+        summary.update(
+            server_cpu_s=cpu,
+            server_cpu_util=cpu / wall,
+            server_cpu_ms_per_rerun=cpu / reruns * 1000 if reruns else None,
+            reruns_per_core_s=reruns / cpu if cpu else None,
+            server_rss_mb=after[1] / 2**20,
+            server_peak_rss_mb=after[2] / 2**20,
+        )
+    return summary
+
+
+def report(summary, out=print):
+    out(f"{summary['sessions']} sessions, {summary['seconds']:.1f}s: {summary['reruns']:,} reruns "
+        f"({summary['reruns_per_s']:,.1f}/s), {summary['valuations']:,} valuations, "
+        f"{summary['errors']} errors, {summary['failed_sessions']} failed sessions")
+    for name, latency in summary["latency_ms"].items():
+        out(f"  {name:<10} n={latency['count']:>6,}  p50 {latency['p50']:8.1f} ms  p90 {latency['p90']:8.1f} ms  "
+            f"p99 {latency['p99']:8.1f} ms  max {latency['max']:8.1f} ms")
+    if "server_cpu_s" in summary:
+        out(f"  server: {summary['server_cpu_util']:.0%} of a core, {summary['server_cpu_ms_per_rerun']:.1f} ms CPU "
+            f"per rerun (~{summary['reruns_per_core_s']:,.0f} reruns per core-second), "
+            f"RSS {summary['server_rss_mb']:,.0f} MiB (peak {summary['server_peak_rss_mb']:,.0f} MiB)")
+    out(f"  client: {summary['client_cpu_s']:.1f}s CPU")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent browser sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run after ramp-up")
+    parser.add_argument("--think", type=float, default=0.5, help="mean pause between valuations (0 = flat out)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    parser.add_argument("--url", help="app to test (default: start one with run.py)")
+    parser.add_argument("--pid", type=int, help="server process to measure when using --url")
+    parser.add_argument("--catalog", help="PETCALC_CATALOG for the started app")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = run(args.sessions, args.duration, args.think, args.ramp, args.url, args.pid, args.seed, args.catalog)
+    report(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
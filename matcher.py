@@ -0,0 +1,203 @@
+"""Indexed fuzzy name matching.
+
+``process.extractOne`` re-normalises and scores every candidate on every
+call.  ``Matcher`` normalises the candidates once, builds a trigram index,
+and per query only scores the candidates sharing the most trigrams with it,
+using the same scorer (``fuzz.WRatio``) and tie-breaking (first best
+candidate wins) as ``extractOne``.  Candidate sets no larger than the
+shortlist are scored in full, so small option lists behave exactly as
+before.
+
+    python matcher.py --bench
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from fuzzywuzzy import fuzz, process, utils
+
+import instrument
+from cache import LRUCache, MISSING
+
+_process = partial(utils.full_process, force_ascii=True)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Matcher:
+    def __init__(self, candidates, threshold=70, shortlist=32, cache_size=4096):
+        self.candidates = list(candidates)
+        self.threshold = threshold
+        self.shortlist = shortlist
+        self.processed = [_process(candidate) for candidate in self.candidates]
+        self.index = defaultdict(list)
+        self.exact = {}
+        for i, text in enumerate(self.processed):
+            self.exact.setdefault(text, i)
+            for gram in trigrams(text):
+                self.index[gram].append(i)
+        if len(self.candidates) > shortlist:
+            # Shortlists over large sets count shared trigrams with numpy,
+            # imported only here: small option lists never need it.
+            import numpy as np
+            self.index = {gram: np.array(rows, dtype=np.intp) for gram, rows in self.index.items()}
+            self.lengths = np.array([len(text) + 2 for text in self.processed])
+        # The index is read-only once built; only the LRU needs the lock.
+        self.recent = LRUCache(cache_size)
+        self.lock = threading.Lock()
+
+    def _shortlist(self, query):
+        if len(self.candidates) <= self.shortlist:
+            return range(len(self.candidates))
+        import numpy as np
+
+        postings = [self.index[gram] for gram in trigrams(query) if gram in self.index]
+        if not postings:
+            return ()
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.candidates))
+        hits = np.flatnonzero(shared)
+        counts = shared[hits]
+        # Keep candidates that share the most trigrams both outright (favours
+        # longer names containing the query) and relative to their length.
+        by_count = hits[np.argsort(-counts, kind="stable")[:self.shortlist]]
+        by_share = hits[np.argsort(-counts / self.lengths[hits], kind="stable")[:self.shortlist]]
+        return np.union1d(by_count, by_share).tolist()
+
+    def extract_one(self, query):
+        """Best ``(candidate, score)`` for ``query``, or None if there are no candidates."""
+        with self.lock:
+            cached = self.recent.get(query)
+        if cached is not MISSING:
+            return cached
+        processed = _process(query)
+        best = None
+        if processed:
+            for i in self._shortlist(processed):
+                score = fuzz.WRatio(processed, self.processed[i], full_process=False)
+                if best is None or score > best[1]:
+                    best = (self.candidates[i], score)
+        elif self.candidates:
+            best = (self.candidates[0], 0)
+        with self.lock:
+            self.recent.put(query, best)
+        return best
+
+    def lookup(self, query):
+        """Candidate equal to ``query`` once both are normalised (case,
+        punctuation, spacing), or None.  No fuzzy scoring."""
+        i = self.exact.get(_process(query))
+        return None if i is None else self.candidates[i]
+
+    def match(self, query, threshold=None):
+        """Closest candidate scoring at least ``threshold``, else None."""
+        threshold = self.threshold if threshold is None else threshold
+        with instrument.stage("match"):
+            best = self.extract_one(query)
+        return best[0] if best is not None and best[1] >= threshold else None
+
+    def match_many(self, queries, threshold=None):
+        """``match`` for each query, scoring repeated queries once."""
+        matches = {query: self.match(query, threshold) for query in dict.fromkeys(queries)}
+        return [matches[query] for query in queries]
+
+
+_matchers = LRUCache(64)
+_matchers_lock = threading.Lock()
+
+
+def matcher_for(valid_strings):
+    """Shared ``Matcher`` for an option list, built on first use."""
+    key = tuple(valid_strings)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is MISSING:
+            matcher = Matcher(key)
+            _matchers.put(key, matcher)
+    return matcher
+
+
+def find_closest_match(input_string, valid_strings, threshold=70):
+    return matcher_for(valid_strings).match(input_string, threshold)
+
+
+# ──────────────────────────  Benchmark  ──────────────────────────
+SYLLABLES = [
+    "dra", "gon", "ky", "neko", "phan", "tom", "shad", "ow", "cry", "stal", "aur", "ora",
+    "vo", "id", "blaze", "frost", "em", "ber", "lu", "na", "sol", "ar", "pix", "el", "zap",
+]
+
+
+def pet_names(n, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(word.capitalize() for word in words))
+    return sorted(names)
+
+
+def typo(name, rng):
+    chars = list(name.lower())
+    i = rng.randrange(len(chars))
+    op = rng.choice(["drop", "swap", "replace"])
+    if op == "drop" and len(chars) > 3:
+        del chars[i]
+    elif op == "swap" and i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    else:
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000), queries=20, seed=0, out=print):
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        names = pet_names(size, seed)
+        sample = [typo(rng.choice(names), rng) for _ in range(queries)]
+
+        start = time.perf_counter()
+        matcher = Matcher(names)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [matcher.extract_one(query) for query in sample]
+        indexed_time = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        baseline = [process.extractOne(query, names) for query in sample]
+        baseline_time = (time.perf_counter() - start) / queries
+
+        agree = sum(a[1] == b[1] for a, b in zip(indexed, baseline))
+        results.append({
+            "candidates": size,
+            "build_s": build,
+            "indexed_ms": indexed_time * 1000,
+            "extractOne_ms": baseline_time * 1000,
+            "speedup": baseline_time / indexed_time,
+            "same_best_score": agree / queries,
+        })
+        out(
+            f"{size:>7,} candidates: build {build:.2f}s | indexed {indexed_time * 1000:8.2f} ms/query | "
+            f"extractOne {baseline_time * 1000:9.2f} ms/query | x{baseline_time / indexed_time:,.0f} | "
+            f"same best score {agree}/{queries}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fuzzy matcher utilities.")
+    parser.add_argument("--bench", action="store_true", help="compare Matcher with process.extractOne")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.sizes, args.queries)
+    else:
+        parser.print_help()
@@ -0,0 +1,142 @@
+"""Monte Carlo uncertainty bands for valuations.
+
+Inputs such as ``exist``, ``rarity``, ``demand`` and ``island_chance`` are
+estimates from community trackers, so instead of one point value
+``simulate`` draws N samples of every uncertain input, values them in bulk
+with ``batch.calculate_values`` and summarises the spread:
+
+    result = simulate("Rift", "shiny", dict(
+        exist=Normal(250, 25), rarity=Uniform(8e5, 1.2e6), demand=12,
+        island_chance=Uniform(3, 6), availability="Still Obtainable",
+    ), n=1_000_000, seed=42)
+    result.mean, result.percentiles[95]
+
+Samples are drawn in fixed-size chunks, each from its own child of the seed
+(``numpy.random.SeedSequence.spawn``), so a seed reproduces the same values
+whether the chunks run in-process or across a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import calculate_values
+
+CHUNK_SIZE = 250_000
+
+# Below this many samples a process pool costs more to start than it saves.
+PARALLEL_THRESHOLD = 4_000_000
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Sampled inputs are clipped to the ranges the app accepts.
+DOMAIN = {
+    "exist": (1, None),
+    "rarity": (0.0001, None),
+    "demand": (1, 20),
+    "c": (0.01, None),
+    "price": (1, None),
+    "variant_multi": (0, None),
+    "island_chance": (0.0001, 100),
+}
+
+
+# ──────────────────────────  Distributions  ──────────────────────────
+class Uniform:
+    """Any value in ``low..high`` equally likely."""
+
+    def __init__(self, low, high):
+        self.low = float(min(low, high))
+        self.high = float(max(low, high))
+
+    def sample(self, rng, n):
+        return rng.uniform(self.low, self.high, n)
+
+    def __repr__(self):
+        return f"Uniform({self.low!r}, {self.high!r})"
+
+
+class Normal:
+    """Normally distributed around ``mean`` with standard deviation ``std``."""
+
+    def __init__(self, mean, std):
+        self.mean = float(mean)
+        self.std = abs(float(std))
+
+    def sample(self, rng, n):
+        return rng.normal(self.mean, self.std, n)
+
+    def __repr__(self):
+        return f"Normal({self.mean!r}, {self.std!r})"
+
+
+def _is_distribution(value):
+    return hasattr(value, "sample")
+
+
+# ──────────────────────────  Sampling  ──────────────────────────
+def _chunk(type_input, variant_input, inputs, size, seed):
+    """Draw ``size`` samples from a child seed and value them."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, value in inputs.items():
+        if _is_distribution(value):
+            value = value.sample(rng, size)
+            low, high = DOMAIN.get(name, (None, None))
+            if low is not None or high is not None:
+                np.clip(value, low, high, out=value)
+        columns[name] = value
+    return np.broadcast_to(calculate_values(type_input, variant_input, **columns), (size,))
+
+
+class Uncertainty:
+    """Summary of a simulation: ``mean``, ``std``, ``percentiles`` (a dict
+    keyed by percentile), and ``counts``/``edges`` of a histogram spanning
+    the 0.5th to 99.5th percentile.  ``seed`` reproduces the run."""
+
+    def __init__(self, values, seed, bins=50):
+        finite = values[np.isfinite(values)]
+        self.n = len(values)
+        self.valid = len(finite)
+        self.seed = seed
+        if not self.valid:
+            self.mean = self.std = np.nan
+            self.percentiles = {p: np.nan for p in PERCENTILES}
+            self.counts, self.edges = np.zeros(0, dtype=int), np.zeros(0)
+            return
+        self.mean = float(finite.mean())
+        self.std = float(finite.std())
+        levels = np.percentile(finite, [0.5, *PERCENTILES, 99.5])
+        self.percentiles = dict(zip(PERCENTILES, levels[1:-1].tolist()))
+        self.counts, self.edges = np.histogram(finite, bins=bins, range=(levels[0], levels[-1]))
+
+    def __repr__(self):
+        bands = ", ".join(f"p{p}={v:,.4g}" for p, v in self.percentiles.items())
+        return f"<Uncertainty n={self.n:,} mean={self.mean:,.4g} std={self.std:,.4g} {bands}>"
+
+
+def simulate(type_input, variant_input, inputs, n=1_000_000, seed=None, chunk_size=CHUNK_SIZE, workers=None,
+             bins=50):
+    """Value a pet ``n`` times with its uncertain inputs resampled each time.
+
+    ``inputs`` holds ``batch.calculate_values`` keyword arguments; any value
+    with a ``sample(rng, n)`` method (``Uniform``, ``Normal``) is drawn per
+    sample, everything else is held fixed.  ``workers`` defaults to every
+    core when ``n`` reaches ``PARALLEL_THRESHOLD`` and 1 otherwise.
+    Returns an ``Uncertainty``.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, n - start) for start in range(0, n, chunk_size)]
+    seeds = seed_sequence.spawn(len(sizes))
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n >= PARALLEL_THRESHOLD else 1
+    workers = min(workers, len(sizes))
+
+    tasks = [(type_input, variant_input, inputs, size, child) for size, child in zip(sizes, seeds)]
+    if workers <= 1:
+        chunks = [_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_chunk, *zip(*tasks)))
+    values = np.concatenate(chunks) if chunks else np.empty(0)
+    return Uncertainty(values, seed_sequence.entropy, bins)
@@ -0,0 +1,113 @@
+"""Precision policy: float64 first, mpmath where float64 can't be trusted.
+
+Every valuation runs in float64.  It is recomputed with mpmath at
+``formulas.MPMATH_DIGITS`` significant digits when float64 overflowed or
+underflowed (an ``OverflowError``, or a non-finite or subnormal result), when
+a final ``i1 - i2`` subtraction cancels more than ``CANCELLATION_LIMIT``
+(see ``formulas.condition``), or when the formula reads ``c`` and
+``c < SMALL_C``: the decay integrals' closed forms then subtract terms of
+order ``1 / c ** 2`` that nearly cancel.  (The ``const_integral``
+differences are rearranged by ``const_integral_step`` and never cancel.)
+
+``fallbacks`` counts recomputations by (formula set, pet type, reason); they
+are also reported to ``instrument`` when it is enabled.
+"""
+import math
+import sys
+import threading
+from collections import Counter
+
+import formulas
+import instrument
+
+# Rounding error grows by this factor at most before we recompute: ~1e-10
+# relative error in float64.
+CANCELLATION_LIMIT = 1e6
+
+SMALL_C = 0.01
+
+# ``check`` reasons, in the order they are tested; ``check_array`` returns
+# indices into this.
+REASONS = ("overflow", "underflow", "cancellation", "small c")
+
+fallbacks = Counter()
+_lock = threading.Lock()
+
+
+def check(formula, value, condition, c):
+    """Why a float64 result can't be trusted, or None if it can."""
+    if not math.isfinite(value):
+        return "overflow"
+    if 0 < abs(value) < sys.float_info.min:
+        return "underflow"
+    if not condition <= CANCELLATION_LIMIT:
+        return "cancellation"
+    if "c" in formula.reads and c < SMALL_C:
+        return "small c"
+    return None
+
+
+def check_array(formula, values, conditions, c):
+    """Per row, the index into ``REASONS`` of why ``check`` would recompute
+    it, or -1 where float64 can be trusted."""
+    import numpy as np
+
+    values, conditions, c = np.asarray(values), np.asarray(conditions), np.asarray(c)
+    masks = [
+        ~np.isfinite(values),
+        (values != 0) & (np.abs(values) < sys.float_info.min),
+        ~(conditions <= CANCELLATION_LIMIT),
+        c < SMALL_C if "c" in formula.reads else np.zeros((), dtype=bool),
+    ]
+    reasons = np.full(np.broadcast_shapes(*(mask.shape for mask in masks)), -1, dtype=np.int8)
+    for i, mask in reversed(list(enumerate(masks))):
+        reasons[np.broadcast_to(mask, reasons.shape)] = i
+    return reasons
+
+
+def recompute(formula_set, index, args, reason):
+    """Evaluate formula ``index`` of ``formula_set`` on ``args`` (``INPUTS``
+    order) with mpmath, returning a float."""
+    formula = formula_set.formulas[index]
+    with _lock:
+        fallbacks[(formula_set.name, formula.types[0], reason)] += 1
+    instrument.count("precision.fallback", f"{formula_set.name}/{formula.types[0]}/{reason}")
+    mpf = formulas.helpers("mpmath")["mpf"]
+    function = formula_set.compiled("mpmath")[index]
+    return float(function(*(None if arg is None else mpf(arg) for arg in args)))
+
+
+def recompute_array(formula_set, index, args, reasons):
+    """``recompute`` for many rows: ``args`` are ``INPUTS``-ordered arrays
+    over the rows and ``reasons`` their ``check_array`` codes.  mpmath is
+    scalar-only, so rows are still evaluated one at a time, but counted and
+    converted in bulk."""
+    import numpy as np
+
+    formula = formula_set.formulas[index]
+    counts = np.bincount(reasons, minlength=len(REASONS)).tolist()
+    with _lock:
+        for reason, n in zip(REASONS, counts):
+            if n:
+                fallbacks[(formula_set.name, formula.types[0], reason)] += n
+    for reason, n in zip(REASONS, counts):
+        if n:
+            instrument.count("precision.fallback", f"{formula_set.name}/{formula.types[0]}/{reason}", n)
+    mpf = formulas.helpers("mpmath")["mpf"]
+    function = formula_set.compiled("mpmath")[index]
+    evaluate = np.frompyfunc(lambda *row: float(function(*map(mpf, row))), len(args), 1)
+    return evaluate(*args).astype(float)
+
+
+def stats():
+    """One row per (formula set, type, reason) with its fallback count."""
+    with _lock:
+        return [
+            {"formula_set": name, "type": type_input, "reason": reason, "count": n}
+            for (name, type_input, reason), n in sorted(fallbacks.items())
+        ]
+
+
+def reset():
+    with _lock:
+        fallbacks.clear()
@@ -0,0 +1,121 @@
+"""Startup and rerun profile for the Streamlit app.
+
+Measures, each in a fresh interpreter, how long the app's imports take, then
+drives PetCalculator.py headlessly with Streamlit's ``AppTest`` to time the
+first (cold) script run and the reruns triggered by widget changes and
+"Calculate Value" clicks.  Exits non-zero when a budget is exceeded.
+
+    python profile_startup.py
+    python profile_startup.py --import-budget-ms 600 --rerun-budget-ms 100 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "PetCalculator.py")
+
+IMPORTS = ["streamlit", "engine", "cache", "matcher", "sympy"]
+
+PET_TYPES = ["Permanent", "Limited", "Legendary Pass", "Secret Pass", "Rift", "Shop"]
+VARIANTS = ["normal", "shiny", "mythic", "shiny mythic"]
+
+
+def import_time(module):
+    """Milliseconds to import ``module`` in a fresh interpreter (excluding interpreter start)."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print((time.perf_counter() - start) * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code], cwd=HERE, capture_output=True, text=True
+    )
+    if result.returncode:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def rerun_times(reruns=3):
+    from streamlit.testing.v1 import AppTest
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        start = time.perf_counter()
+        at = AppTest.from_file(APP, default_timeout=30).run()
+        cold = time.perf_counter() - start
+
+        timings = []
+        for _ in range(reruns):
+            for pet_type in PET_TYPES:
+                for variant in VARIANTS:
+                    start = time.perf_counter()
+                    at.selectbox[0].set_value(pet_type)
+                    at.selectbox[1].set_value(variant).run()
+                    timings.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    at.button[0].click().run()
+                    timings.append(time.perf_counter() - start)
+                    if at.exception:
+                        raise RuntimeError(f"{pet_type}/{variant}: {at.exception[0].message}")
+    return cold, timings
+
+
+def profile(reruns=3):
+    imports = {module: import_time(module) for module in IMPORTS}
+    cold, timings = rerun_times(reruns)
+    timings_ms = sorted(t * 1000 for t in timings)
+    return {
+        "import_ms": imports,
+        "app_import_ms": sum(imports[m] or 0 for m in ("streamlit", "engine")),
+        "cold_run_ms": cold * 1000,
+        "rerun_ms": {
+            "count": len(timings_ms),
+            "median": statistics.median(timings_ms),
+            "p95": timings_ms[int(0.95 * (len(timings_ms) - 1))],
+            "max": timings_ms[-1],
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile PetCalculator.py startup and rerun cost.")
+    parser.add_argument("--reruns", type=int, default=3, help="passes over every pet type and variant")
+    parser.add_argument("--import-budget-ms", type=float, default=750,
+                        help="budget for the imports the app pays on its first run")
+    parser.add_argument("--rerun-budget-ms", type=float, default=100, help="budget for the p95 rerun")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    report = profile(args.reruns)
+    over = []
+    if report["app_import_ms"] > args.import_budget_ms:
+        over.append(f"app imports {report['app_import_ms']:.0f} ms > {args.import_budget_ms:.0f} ms")
+    if report["rerun_ms"]["p95"] > args.rerun_budget_ms:
+        over.append(f"p95 rerun {report['rerun_ms']['p95']:.1f} ms > {args.rerun_budget_ms:.0f} ms")
+    report["over_budget"] = over
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for module, ms in report["import_ms"].items():
+            print(f"import {module:<10} {'unavailable' if ms is None else f'{ms:8.1f} ms'}")
+        print(f"app imports       {report['app_import_ms']:8.1f} ms (budget {args.import_budget_ms:.0f})")
+        print(f"cold script run   {report['cold_run_ms']:8.1f} ms")
+        rerun = report["rerun_ms"]
+        print(
+            f"reruns            median {rerun['median']:.1f} ms | p95 {rerun['p95']:.1f} ms | "
+            f"max {rerun['max']:.1f} ms over {rerun['count']} (budget p95 {args.rerun_budget_ms:.0f})"
+        )
+        for line in over:
+            print(f"OVER BUDGET: {line}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""Sorted value index over a catalog: top-K, value ranges and ranks.
+
+``ValueIndex`` keeps one ``SortedValues`` per (type, variant, availability)
+partition of a ``catalog.Catalog``, ordered by value (ties by row).  It
+subscribes to the catalog, so every row revalued by ``Catalog.update`` or
+``Catalog.apply`` is moved within the index instead of rebuilding it:
+
+    index = ValueIndex(catalog)
+    rows, values = index.top(100, variant_input="shiny mythic")
+    rows, values = index.between(1_000, 5_000, type_input="Shop")
+    index.rank(catalog.index["Huge Cat"])
+
+    python ranking.py --bench
+"""
+import argparse
+import bisect
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from catalog import TYPES, VARIANTS, Catalog, synthetic_records
+
+LOAD = 1024
+
+# Change sets touching more than this fraction of the index rebuild it on
+# the next query instead of moving rows one by one.  A full revalue resets
+# the index up front rather than reporting its chunks.
+REBUILD_FRACTION = 0.05
+
+# Row sentinels sorting before/after every real row with the same value.
+_FIRST = -1
+_LAST = 2 ** 62
+
+
+# ──────────────────────────  Sorted values  ──────────────────────────
+class SortedValues:
+    """(value, row) pairs kept sorted in NumPy blocks of about ``load`` pairs.
+
+    Bisecting the block maxima finds a block and ``searchsorted`` the place
+    in it; a Fenwick tree over block sizes turns places into ranks and back.
+    Lookups are O(log n); an insert or removal also copies one block.
+    """
+
+    def __init__(self, values=(), rows=(), load=LOAD):
+        values = np.asarray(values, dtype=float)
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.lexsort((rows, values))
+        self._load = load
+        blocks = max(1, -(-len(values) // load))
+        self._values = [block.copy() for block in np.array_split(values[order], blocks)] if len(values) else []
+        self._rows = [block.copy() for block in np.array_split(rows[order], blocks)] if len(values) else []
+        self._rebuild()
+
+    def _rebuild(self):
+        self._maxes = [(float(values[-1]), int(rows[-1])) for values, rows in zip(self._values, self._rows)]
+        tree = [0] * (len(self._values) + 1)
+        for i, block in enumerate(self._values, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._len = sum(len(block) for block in self._values)
+
+    def __len__(self):
+        return self._len
+
+    def _grow(self, block, delta):
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+        self._len += delta
+
+    def _before(self, block):
+        """Number of pairs in blocks before ``block``."""
+        total = 0
+        while block > 0:
+            total += self._tree[block]
+            block -= block & -block
+        return total
+
+    def _find(self, position):
+        """(block, offset) of the pair at sorted ``position``."""
+        block, step = 0, 1 << len(self._tree).bit_length()
+        while step:
+            if block + step < len(self._tree) and self._tree[block + step] <= position:
+                block += step
+                position -= self._tree[block]
+            step >>= 1
+        return block, position
+
+    def _offset(self, block, value, row):
+        values = self._values[block]
+        low = int(np.searchsorted(values, value, "left"))
+        high = int(np.searchsorted(values, value, "right"))
+        if low == high:
+            return low
+        return low + int(np.searchsorted(self._rows[block][low:high], row, "left"))
+
+    def count_below(self, value, row=_FIRST):
+        """Number of pairs sorting before ``(value, row)``."""
+        block = bisect.bisect_left(self._maxes, (value, row))
+        if block == len(self._maxes):
+            return self._len
+        return self._before(block) + self._offset(block, value, row)
+
+    def add(self, value, row):
+        if not self._values:
+            self._values, self._rows = [np.array([value], dtype=float)], [np.array([row], dtype=np.int64)]
+            self._rebuild()
+            return
+        block = min(bisect.bisect_left(self._maxes, (value, row)), len(self._maxes) - 1)
+        offset = self._offset(block, value, row)
+        self._values[block] = values = np.insert(self._values[block], offset, value)
+        self._rows[block] = rows = np.insert(self._rows[block], offset, row)
+        if offset == len(values) - 1:
+            self._maxes[block] = (float(value), int(row))
+        if len(values) > 2 * self._load:
+            half = len(values) // 2
+            self._values[block:block + 1] = [values[:half].copy(), values[half:].copy()]
+            self._rows[block:block + 1] = [rows[:half].copy(), rows[half:].copy()]
+            self._rebuild()
+        else:
+            self._grow(block, 1)
+
+    def remove(self, value, row):
+        block = bisect.bisect_left(self._maxes, (value, row))
+        offset = self._offset(block, value, row) if block < len(self._maxes) else 0
+        if (block == len(self._maxes) or offset == len(self._values[block])
+                or self._values[block][offset] != value or self._rows[block][offset] != row):
+            raise KeyError((value, row))
+        values = self._values[block] = np.delete(self._values[block], offset)
+        rows = self._rows[block] = np.delete(self._rows[block], offset)
+        if not len(values):
+            del self._values[block], self._rows[block]
+            self._rebuild()
+            return
+        self._maxes[block] = (float(values[-1]), int(rows[-1]))
+        self._grow(block, -1)
+
+    def slice(self, start, stop):
+        """Values and rows of the pairs at sorted positions ``start:stop``."""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        block, offset = self._find(start)
+        values, rows, remaining = [], [], stop - start
+        while remaining:
+            take = min(remaining, len(self._values[block]) - offset)
+            values.append(self._values[block][offset:offset + take])
+            rows.append(self._rows[block][offset:offset + take])
+            remaining -= take
+            block, offset = block + 1, 0
+        return np.concatenate(values), np.concatenate(rows)
+
+    def between(self, low, high):
+        """Pairs with ``low <= value <= high``, ascending."""
+        return self.slice(self.count_below(low, _FIRST), self.count_below(high, _LAST))
+
+    def largest(self, k):
+        """The ``k`` largest pairs, descending."""
+        values, rows = self.slice(self._len - k, self._len)
+        return values[::-1], rows[::-1]
+
+
+# ──────────────────────────  Value index  ──────────────────────────
+def _partition(type_code, variant_code, obtainable):
+    return int(type_code), int(variant_code), bool(obtainable)
+
+
+class ValueIndex:
+    """Per-partition ``SortedValues`` over a catalog's ``value`` column.
+
+    Rows with a NaN value (no formula applies) are left out.  Filters
+    (``type_input``, ``variant_input``, ``availability``) default to every
+    partition; any availability other than "Still Obtainable" means limited.
+    """
+
+    def __init__(self, catalog, load=LOAD):
+        self.catalog = catalog
+        self.load = load
+        self._build()
+        catalog.listeners.append(self)
+
+    def _build(self):
+        self.partitions = {}
+        self._stale = False
+        rows = self.catalog.rows
+        codes = (rows["type"].astype(np.int64) * len(VARIANTS) + rows["variant"]) * 2 + rows["obtainable"]
+        values = np.asarray(rows["value"], dtype=float)
+        keep = np.flatnonzero(~np.isnan(values))
+        order = keep[np.argsort(codes[keep], kind="stable")]
+        starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+        for start, stop in zip(starts, [*starts[1:], len(order)]):
+            members = order[start:stop]
+            code = int(codes[members[0]])
+            key = _partition(code // (2 * len(VARIANTS)), code // 2 % len(VARIANTS), code % 2)
+            self.partitions[key] = SortedValues(values[members], members, self.load)
+
+    def __len__(self):
+        if self._stale:
+            self._build()
+        return sum(len(partition) for partition in self.partitions.values())
+
+    def _matching(self, type_input=None, variant_input=None, availability=None):
+        if self._stale:
+            self._build()
+        type_code = None if type_input is None else TYPES.index(type_input)
+        variant_code = None if variant_input is None else VARIANTS.index(variant_input)
+        obtainable = None if availability is None else availability == "Still Obtainable"
+        return [
+            partition for (t, v, o), partition in self.partitions.items()
+            if type_code in (None, t) and variant_code in (None, v) and obtainable in (None, o)
+        ]
+
+    def reset(self):
+        """Catalog hook: every value may have changed; rebuild on next query."""
+        self._stale = True
+        self.partitions = {}
+
+    def changed(self, rows, before, after):
+        """Catalog hook: move revalued rows (``before`` is None for new rows)."""
+        if self._stale or len(rows) > REBUILD_FRACTION * len(self.catalog):
+            self._stale = True
+            return
+        for i, row in enumerate(rows.tolist()):
+            old = None if before is None else before[i]
+            new = after[i]
+            old_key = None if old is None else _partition(old["type"], old["variant"], old["obtainable"])
+            new_key = _partition(new["type"], new["variant"], new["obtainable"])
+            if old is not None and old_key == new_key and (old["value"] == new["value"]):
+                continue
+            if old is not None and not np.isnan(old["value"]):
+                self.partitions[old_key].remove(float(old["value"]), row)
+            if not np.isnan(new["value"]):
+                if new_key not in self.partitions:
+                    self.partitions[new_key] = SortedValues()
+                self.partitions[new_key].add(float(new["value"]), row)
+
+    def top(self, k=100, type_input=None, variant_input=None, availability=None):
+        """Rows and values of the ``k`` most valuable matching pets, descending."""
+        parts = [partition.largest(k) for partition in self._matching(type_input, variant_input, availability)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        values = np.concatenate([values for values, _ in parts])
+        rows = np.concatenate([rows for _, rows in parts])
+        order = np.lexsort((-rows, -values))[:k]
+        return rows[order], values[order]
+
+    def between(self, low, high, type_input=None, variant_input=None, availability=None):
+        """Rows and values of matching pets worth ``low..high``, ascending."""
+        parts = [partition.between(low, high) for partition in self._matching(type_input, variant_input, availability)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        values = np.concatenate([values for values, _ in parts])
+        rows = np.concatenate([rows for _, rows in parts])
+        order = np.lexsort((rows, values))
+        return rows[order], values[order]
+
+    def rank(self, row, type_input=None, variant_input=None, availability=None):
+        """1-based rank of a pet by value among the matching pets (1 = most
+        valuable), or None if it has no value."""
+        value = float(self.catalog.rows["value"][row])
+        if np.isnan(value):
+            return None
+        return 1 + sum(
+            len(partition) - partition.count_below(value, row + 1)
+            for partition in self._matching(type_input, variant_input, availability)
+        )
+
+
+# ──────────────────────────  Benchmark  ──────────────────────────
+def _timed(label, call, out, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = call()
+    out(f"{label:<48} {(time.perf_counter() - start) / repeat * 1000:>10.3f} ms")
+    return result
+
+
+def benchmark(sizes=(100_000, 1_000_000), out=print):
+    for size in sizes:
+        out(f"── {size:,} pets")
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = Catalog.create(os.path.join(tmp, "pets.npy"), synthetic_records(size))
+            def sort_everything():
+                catalog.revalue()
+                values = catalog.values()
+                mask = catalog.rows["variant"] == VARIANTS.index("shiny mythic")
+                rows = np.flatnonzero(mask)
+                return rows[np.argsort(-values[rows])[:100]]
+
+            _timed("baseline: revalue all + sort, top 100", sort_everything, out)
+            index = _timed("build index", lambda: ValueIndex(catalog), out)
+            _timed("top 100 shiny mythic", lambda: index.top(100, variant_input="shiny mythic"), out, 100)
+            _timed("top 100 overall", lambda: index.top(100), out, 100)
+            rows, _ = _timed("between 1,000 and 1,100", lambda: index.between(1_000, 1_100), out, 100)
+            out(f"{'  (rows returned)':<48} {len(rows):>10,}")
+            _timed("rank of one pet", lambda: index.rank(size // 2), out, 1_000)
+
+            rng = np.random.default_rng(0)
+            pets = iter(rng.integers(0, size, 1_000).tolist())
+            _timed("revalue one pet (catalog + index)",
+                   lambda: catalog.update([next(pets)], exist=float(rng.integers(1, 5_000))), out, 1_000)
+            catalog.listeners.remove(index)
+            del index, catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sorted value index.")
+    parser.add_argument("--bench", action="store_true", help="run the 100k and 1M pet benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.sizes)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
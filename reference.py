@@ -0,0 +1,322 @@
+"""Symbolic reference implementation of the valuation formulas.
+
+This is the original sympy derivation from PetCalculator.py and Calc.py.  It
+is slow (two ``smp.integrate`` calls per valuation) and only used to verify
+the closed forms in ``engine.py``:
+
+    python reference.py
+"""
+import sympy as smp
+
+import engine
+import instrument
+
+
+@instrument.timed_valuation("sympy")
+def calculate_value(
+        type_input,
+        variant_input,
+        exist=None,
+        rarity=None,
+        demand=None,
+        c=None,
+        price=None,
+        variant_multi=None,
+        island_chance=None,
+        availability=None,
+):
+    x_sym = smp.Symbol("x")
+    multiplier = engine.variant_multipliers.get(variant_input, 1)
+
+    if type_input in ["Permanent", "Limited"]:
+        multiplier_factor = 0.1 if type_input == "permanent" else 0.25
+        diff = 2 * (smp.sqrt((rarity * multiplier) / exist) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
+
+    elif type_input == "Rift":
+        multiplier_factor = 0.1 if availability == "Still Obtainable" else 0.25
+        const_expr = (rarity * multiplier) * (island_chance / 100)
+        i1 = smp.integrate(
+            smp.sqrt(const_expr / (exist + 1)), (x_sym, engine.SAFE_LOWER, exist + 1)
+        )
+        i2 = smp.integrate(
+            smp.sqrt(const_expr / exist), (x_sym, engine.SAFE_LOWER, exist)
+        )
+        diff = 2 * ((i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
+
+    elif type_input == "Legendary Pass":
+        if availability == "Still Obtainable":
+            i1 = smp.integrate(
+                (((1 + smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1)
+            )
+            i2 = smp.integrate(
+                (((1 + smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand)
+            )
+            diff = (i1 - i2) ** 2.5
+            if variant_input == "normal":
+                diff = 2 * (smp.sqrt(diff) * 0.1)
+            else:
+                diff = diff / (1 / (variant_multi / 3))
+                diff = 2 * (0.1 * smp.sqrt(diff))
+        else:
+            i1 = smp.integrate(
+                (((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1)
+            )
+            i2 = smp.integrate(
+                (((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand)
+            )
+            diff = (i1 - i2) ** 2.5
+            if variant_input == "normal":
+                diff = 2 * (smp.sqrt(diff) * 0.2)
+            else:
+                diff = diff / (1 / (variant_multi / 3))
+                diff = 2 * (smp.sqrt(diff) * 0.2)
+
+    elif type_input == "Secret Pass":
+        multiplier_factor = 0.1 if availability == "Still Obtainable" else 0.25
+        if variant_input == "normal":
+            i1 = smp.integrate(
+                smp.sqrt((rarity ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
+            )
+            i2 = smp.integrate(
+                smp.sqrt((rarity ** 2) / exist), (x_sym, 0, exist)
+            )
+            diff = 2 * (i1 - i2) * (1 + multiplier_factor * smp.exp(0.25 * demand))
+        else:
+            i1 = smp.integrate(
+                smp.sqrt(((rarity * variant_multi) ** 2) / (exist + 1)), (x_sym, 0, exist + 1)
+            )
+            i2 = smp.integrate(
+                smp.sqrt(((rarity * variant_multi) ** 2) / exist), (x_sym, 0, exist)
+            )
+            diff = ((i1 - i2) ** 2) / (1 / (variant_multi / 3))
+            diff = 2 * (smp.cbrt(diff) * (1 + multiplier_factor * smp.exp(0.25 * demand)))
+
+    elif type_input == "Shop":
+        i1 = smp.integrate(
+            (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand + 1)
+        )
+        i2 = smp.integrate(
+            (price * (1 - smp.exp(-c * x_sym))) / (c / x_sym), (x_sym, 0, demand)
+        )
+        diff = (i1 - i2) ** 1.25
+        if variant_input == "normal":
+            diff = 2 * (0.5 * smp.sqrt(diff))
+        else:
+            diff = 0.25 * (diff / (1 / variant_multi))
+            diff = 2 * smp.sqrt(diff)
+
+    else:
+        return None
+
+    return float(diff.evalf())
+
+
+@instrument.timed_valuation("sympy.cli")
+def cli_value(
+        type_input,
+        variant_input,
+        exist=None,
+        rarity=None,
+        demand=None,
+        c=None,
+        price=None,
+        variant_multi=None,
+):
+    x_sym = smp.Symbol("x")
+
+    if type_input in ["permenant", "limited"]:
+        if variant_input not in engine.cli_variant_multipliers:
+            return None
+        k = rarity * engine.cli_variant_multipliers[variant_input]
+        i1 = smp.integrate(smp.sqrt(k / (exist + 1)), (x_sym, 0, exist + 1))
+        i2 = smp.integrate(smp.sqrt(k / exist), (x_sym, 0, exist))
+        diff = (i1 - i2) * (1 + 0.05 * smp.exp(0.25 * demand))
+
+    elif type_input in ["pass", "non-secret", "non secret"]:
+        i1 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand + 1))
+        i2 = smp.integrate((((1 - smp.exp(-c * x_sym)) / c) / rarity), (x_sym, 0, demand))
+        if variant_input == "normal":
+            diff = (i1 - i2) ** 3
+            diff = smp.sqrt(diff) / 2
+        else:
+            diff = ((i1 - i2) ** 3) / (1 / (variant_multi / 10))
+            diff = 0.5 * smp.sqrt(diff)
+
+    elif type_input == "shop":
+        i1 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand + 1))
+        i2 = smp.integrate((price * (1 - smp.exp(-c * x_sym))) / c, (x_sym, 0, demand))
+        if variant_input == "normal":
+            diff = (i1 - i2) ** 1.5
+            diff = 0.5 * smp.sqrt(diff)
+        elif variant_input == "shiny":
+            diff = ((i1 - i2) ** 1.5) / (1 / (variant_multi / 10))
+            diff = 0.5 * smp.sqrt(diff)
+        else:
+            return None
+
+    else:
+        return None
+
+    return float(diff.evalf())
+
+
+# ──────────────────────────  Verification  ──────────────────────────
+web_cases = [
+    dict(type_input=t, variant_input=v, exist=e, rarity=r, demand=d, availability=a)
+    for t in ["Permanent", "Limited", "Secret Pass"]
+    for v in engine.variant_multipliers
+    for e in [1, 250]
+    for r in [3.5, 1_000_000.0]
+    for d in [1, 20]
+    for a in ["Still Obtainable", "Limited"]
+] + [
+    dict(type_input="Rift", variant_input=v, exist=e, rarity=r, demand=d,
+         island_chance=ic, availability=a)
+    for v in engine.variant_multipliers
+    for e in [1, 250]
+    for r in [3.5, 1_000_000.0]
+    for d in [1, 20]
+    for ic in [0.5, 40.0]
+    for a in ["Still Obtainable", "Limited"]
+] + [
+    dict(type_input="Legendary Pass", variant_input=v, rarity=r, demand=d, c=c, availability=a)
+    for v in engine.variant_multipliers
+    for r in [2.0, 50_000.0]
+    for d in [1, 20]
+    for c in [0.01, 0.35, 2.0]
+    for a in ["Still Obtainable", "Limited"]
+] + [
+    dict(type_input="Shop", variant_input=v, price=p, demand=d, c=c)
+    for v in engine.variant_multipliers
+    for p in [1, 25_000]
+    for d in [1, 20]
+    for c in [0.01, 0.35, 2.0]
+]
+
+cli_cases = [
+    dict(type_input=t, variant_input=v, exist=e, rarity=r, demand=d)
+    for t in ["permenant", "limited"]
+    for v in engine.cli_variant_multipliers
+    for e in [1, 250]
+    for r in [3, 1_000_000]
+    for d in [1, 10]
+] + [
+    dict(type_input="pass", variant_input=v, rarity=r, demand=d, c=c, variant_multi=m)
+    for v in engine.cli_variant_multipliers
+    for r in [2.0, 50_000.0]
+    for d in [1, 10]
+    for c in [0.01, 0.35, 2.0]
+    for m in [10, 35]
+] + [
+    dict(type_input="shop", variant_input=v, price=p, demand=d, c=c, variant_multi=m)
+    for v in ["normal", "shiny"]
+    for p in [1, 25_000]
+    for d in [1, 10]
+    for c in [0.01, 0.35, 2.0]
+    for m in [10, 35]
+]
+
+
+def verify(rel_tol=1e-9):
+    """Compare every engine formula against sympy; return the mismatches."""
+    mismatches = []
+    for value, cases in [(engine.calculate_value, web_cases), (engine.cli_value, cli_cases)]:
+        for case in cases:
+            expected = value(**case, backend="sympy")
+            got = value(**case, backend="float")
+            if expected is None and got is None:
+                continue
+            if expected is None or got is None or abs(got - expected) > rel_tol * max(abs(expected), 1e-300):
+                mismatches.append((case, expected, got))
+    return mismatches
+
+
+# Inputs where float64 overflows or loses digits, so ``engine`` falls back to
+# mpmath (see ``precision.py``).
+precision_web_cases = [
+    dict(type_input=t, variant_input=v, exist=e, rarity=r, demand=d, availability="Limited")
+    for t in ["Permanent", "Secret Pass"]
+    for v in ["normal", "shiny mythic"]
+    for e in [10_000_000, 1e12]
+    for r in [1_000_000.0, 1e160]
+    for d in [1, 2_000, 3_000]
+] + [
+    dict(type_input="Rift", variant_input=v, exist=e, rarity=1_000_000.0, demand=5, island_chance=3.0,
+         availability=a)
+    for v in ["normal", "shiny"]
+    for e in [1e7, 1e12]
+    for a in ["Still Obtainable", "Limited"]
+] + [
+    dict(type_input="Legendary Pass", variant_input=v, rarity=50_000.0, demand=d, c=c, availability=a)
+    for v in ["normal", "mythic"]
+    for d in [1, 20]
+    for c in [1e-4, 1e-6]
+    for a in ["Still Obtainable", "Limited"]
+] + [
+    dict(type_input="Shop", variant_input=v, price=25_000, demand=d, c=c)
+    for v in ["normal", "shiny"]
+    for d in [1, 20]
+    for c in [1e-3, 1e-5]
+]
+
+precision_cli_cases = [
+    dict(type_input="permenant", variant_input="shiny", exist=e, rarity=1_000_000, demand=d)
+    for e in [10_000_000, 1e12]
+    for d in [1, 3_000]
+] + [
+    dict(type_input=t, variant_input="shiny", rarity=50_000.0, price=25_000, demand=d, c=c, variant_multi=35)
+    for t in ["pass", "shop"]
+    for d in [1, 10]
+    for c in [1e-4, 1e-6]
+]
+
+
+def _high_precision(case, digits=50):
+    return {
+        key: smp.Float(value, digits) if isinstance(value, (int, float)) else value
+        for key, value in case.items()
+    }
+
+
+def _agree(expected, got, rel_tol):
+    if expected == got:  # including both infinite
+        return True
+    return abs(got - expected) <= rel_tol * max(abs(expected), 1e-300)
+
+
+def verify_precision(rel_tol=1e-9):
+    """Compare the engine on ill-conditioned inputs against sympy run with
+    50-digit inputs (at 15 digits sympy loses the same digits float64 does);
+    return the mismatches."""
+    mismatches = []
+    for value, reference, cases, multipliers in [
+        (engine.calculate_value, calculate_value, precision_web_cases, engine.variant_multipliers),
+        (engine.cli_value, cli_value, precision_cli_cases, engine.cli_variant_multipliers),
+    ]:
+        for case in cases:
+            exact = _high_precision(case)
+            exact.setdefault("variant_multi", multipliers[case["variant_input"]])
+            expected = float(reference(**exact))
+            got = value(**case, backend="float")
+            if not _agree(expected, got, rel_tol):
+                mismatches.append((case, expected, got))
+    return mismatches
+
+
+if __name__ == "__main__":
+    import precision
+
+    failures = verify()
+    for case, expected, got in failures:
+        print(f"MISMATCH {case}: sympy={expected} engine={got}")
+    print(f"{len(web_cases) + len(cli_cases) - len(failures)}/{len(web_cases) + len(cli_cases)} cases agree")
+
+    precision.reset()
+    precision_failures = verify_precision()
+    for case, expected, got in precision_failures:
+        print(f"MISMATCH {case}: sympy(50 digits)={expected} engine={got}")
+    total = len(precision_web_cases) + len(precision_cli_cases)
+    print(f"{total - len(precision_failures)}/{total} ill-conditioned cases agree")
+    for row in precision.stats():
+        print(f"  fallback {row['formula_set']}/{row['type']} ({row['reason']}): {row['count']}")
+    raise SystemExit(1 if failures or precision_failures else 0)
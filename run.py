@@ -1,4 +1,9 @@
 # run.py
-import subprocess
+import os
+import sys
 
-subprocess.run(["streamlit", "run", "PetCalculator.py"])
+from streamlit.web import cli as stcli
+
+# Launch Streamlit in this process rather than spawning a second interpreter.
+sys.argv = ["streamlit", "run", os.path.join(os.path.dirname(os.path.abspath(__file__)), "PetCalculator.py")] + sys.argv[1:]
+sys.exit(stcli.main())
@@ -0,0 +1,276 @@
+"""Standalone JSON valuation service (stdlib asyncio only).
+
+    python server.py --port 8600
+
+    POST /value         {"type": "Shop", "variant": "shiny", "price": 1000, "demand": 5, "c": 0.3}
+                        -> {"value": 221.75}  (400 {"error": ...} if it can't be valued)
+    POST /value/batch   [{...}, {...}]  (or {"pets": [...]})
+                        -> {"values": [...]}  (plus "errors": [...] if some can't)
+    GET  /stats         request counts and latency percentiles
+
+Single ``/value`` requests that arrive within ``--window-ms`` of each other
+are coalesced into one batch, and every batch is valued on a worker pool so
+the event loop only ever parses and routes.  Pet records use the same field
+names as ``bulk.py``.
+"""
+import argparse
+import asyncio
+import json
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bulk import result_chunk
+
+MAX_BODY = 16 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ──────────────────────────  Batching  ──────────────────────────
+class MicroBatcher:
+    """Coalesce single valuations arriving within ``window`` seconds."""
+
+    def __init__(self, executor, window=0.002, max_batch=512):
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.flush_handle = None
+        self.batches = 0
+
+    async def value(self, record):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((record, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        records = [record for record, _ in batch]
+        try:
+            results = await run_in_pool(self.executor, records)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def run_in_pool(executor, records):
+    """``(value, error)`` per record, valued on the worker pool."""
+    return await asyncio.get_running_loop().run_in_executor(executor, result_chunk, records)
+
+
+# ──────────────────────────  Stats  ──────────────────────────
+class LatencyStats:
+    def __init__(self, window=10_000):
+        self.samples = {}
+        self.counts = {}
+        self.window = window
+
+    def record(self, route, seconds):
+        self.samples.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    def summary(self):
+        out = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            out[route] = {
+                "count": self.counts[route],
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return out
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ──────────────────────────  HTTP  ──────────────────────────
+class ValuationServer:
+    def __init__(self, executor, window=0.002, max_batch=512, max_concurrency=256):
+        self.executor = executor
+        self.batcher = MicroBatcher(executor, window, max_batch)
+        self.stats = LatencyStats()
+        self.limit = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+
+    async def handle(self, method, path, body):
+        if path == "/stats":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return {
+                "routes": self.stats.summary(),
+                "batches": self.batcher.batches,
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+            }
+        if path not in ("/value", "/value/batch"):
+            raise HTTPError(404, f"no route {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError as exc:
+            raise HTTPError(400, f"invalid JSON: {exc}")
+
+        if path == "/value":
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "expected a JSON object")
+            value, error = await self.batcher.value(payload)
+            if error is not None:
+                raise HTTPError(400, error)
+            return {"value": value}
+
+        if isinstance(payload, dict):
+            payload = payload.get("pets")
+        if not isinstance(payload, list) or not all(isinstance(record, dict) for record in payload):
+            raise HTTPError(400, "expected a list of JSON objects")
+        results = await run_in_pool(self.executor, payload)
+        response = {"values": [value for value, _ in results]}
+        if any(error is not None for _, error in results):
+            response["errors"] = [error for _, error in results]
+        return response
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                async with self.limit:
+                    self.active += 1
+                    try:
+                        status, response = 200, await self.handle(method, path, body)
+                    except HTTPError as exc:
+                        status, response = exc.status, {"error": str(exc)}
+                    except Exception as exc:
+                        status, response = 500, {"error": f"internal error: {type(exc).__name__}"}
+                        traceback.print_exc()
+                    finally:
+                        self.active -= 1
+                if status != 404:
+                    self.stats.record(path, time.perf_counter() - start)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as exc:
+            write_response(writer, exc.status, {"error": str(exc)}, False)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, allow_nan=False).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def serve(host="127.0.0.1", port=8600, window=0.002, max_batch=512, max_concurrency=256,
+                workers=None, threads=False):
+    executor = ThreadPoolExecutor(workers) if threads else ProcessPoolExecutor(workers)
+    app = ValuationServer(executor, window, max_batch, max_concurrency)
+    server = await asyncio.start_server(app.serve_client, host, port)
+    print(f"Serving valuations on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pet valuations over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--window-ms", type=float, default=2.0, help="micro-batching window for /value")
+    parser.add_argument("--max-batch", type=int, default=512, help="flush a batch early at this size")
+    parser.add_argument("--max-concurrency", type=int, default=256, help="requests valued at once")
+    parser.add_argument("--workers", type=int, default=None, help="worker pool size (default: all cores)")
+    parser.add_argument("--threads", action="store_true", help="use a thread pool instead of processes")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.window_ms / 1000, args.max_batch,
+                          args.max_concurrency, args.workers, args.threads))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Speculative valuation of every variant while the inputs are being edited.
+
+Users tend to check normal, then shiny, then mythic, then shiny mythic for
+the same pet.  ``Speculation.update`` is called on every rerun with the
+current inputs; when they changed since the last call it cancels the
+running job and starts a new one on a background thread, valuing every
+variant (and both availabilities for pet types whose formula reads it).
+Switching variant afterwards is answered from the finished job.
+"""
+import threading
+
+from cache import BRANCH_FIELDS
+from engine import variant_multipliers
+from formulas import AVAILABILITIES
+
+
+def cases(type_input):
+    """Every ``(variant, availability)`` a pet type is speculated over."""
+    availabilities = AVAILABILITIES if "availability" in BRANCH_FIELDS.get(type_input, ()) else (None,)
+    return [(variant, availability) for variant in variant_multipliers for availability in availabilities]
+
+
+class Job:
+    """Values of every case for one set of inputs, filled in by a worker."""
+
+    def __init__(self, key, type_input, params):
+        self.key = key
+        self.type_input = type_input
+        self.params = params
+        self.values = {}
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.future = None
+
+    def run(self, calculate):
+        try:
+            for variant, availability in cases(self.type_input):
+                if self.cancelled.is_set():
+                    return
+                params = dict(self.params)
+                if availability is not None:
+                    params["availability"] = availability
+                self.values[variant, availability] = calculate(
+                    self.type_input, variant, variant_multi=variant_multipliers[variant], **params
+                )
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def finished(self):
+        return self.done.is_set() and not self.cancelled.is_set()
+
+
+class Speculation:
+    """One session's speculative job, run on a shared ``executor`` with
+    ``calculate`` (``calculate_value``'s signature)."""
+
+    def __init__(self, executor, calculate):
+        self.executor = executor
+        self.calculate = calculate
+        self.job = None
+        self.started = self.cancelled = 0
+
+    def update(self, type_input, params):
+        """Start valuing every case for these inputs unless already under way."""
+        fixed = {name: value for name, value in params.items() if name != "availability"}
+        key = (type_input, tuple(sorted(fixed.items())))
+        if self.job is not None and self.job.key == key:
+            return self.job
+        if self.job is not None and not self.job.done.is_set():
+            self.job.cancel()
+            self.cancelled += 1
+        self.job = Job(key, type_input, fixed)
+        self.job.future = self.executor.submit(self.job.run, self.calculate)
+        self.started += 1
+        return self.job
+
+    def value(self, variant, availability=None, timeout=0.0):
+        """Speculated value of one case, or None if it isn't ready within
+        ``timeout`` seconds."""
+        job = self.job
+        if job is None:
+            return None
+        if "availability" not in BRANCH_FIELDS.get(job.type_input, ()):
+            availability = None
+        job.done.wait(timeout)
+        return job.values.get((variant, availability))
+
+    def table(self, timeout=0.0):
+        """``{variant: {availability: value}}`` once the job has finished
+        (waiting up to ``timeout`` seconds), else None."""
+        job = self.job
+        if job is None or not job.done.wait(timeout) or not job.finished:
+            return None
+        rows = {}
+        for (variant, availability), value in job.values.items():
+            rows.setdefault(variant, {})[availability or "value"] = value
+        return rows
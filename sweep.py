@@ -0,0 +1,95 @@
+"""Parameter sweeps: value a pet over a demand x second-axis grid per variant.
+
+The second axis is ``exist`` for pet types whose formula reads it, ``c`` for
+Legendary Pass and ``price`` for Shop.  ``SweepGrid`` keeps the last grid and,
+when only the axis ranges or the variant set change, recomputes just the new
+rows, columns and variants; any other input change recomputes everything.
+"""
+import numpy as np
+
+from batch import calculate_values
+
+AXES = {
+    "Permanent": "exist",
+    "Limited": "exist",
+    "Rift": "exist",
+    "Secret Pass": "exist",
+    "Legendary Pass": "c",
+    "Shop": "price",
+}
+
+
+def axis_values(start, stop, step):
+    """Inclusive ``start..stop`` range; built from integer step counts so that
+    extending a range reproduces the existing values exactly."""
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return start + step * np.arange(max(count, 1))
+
+
+def evaluate(type_input, variant_input, params, demand, axis):
+    """Values for every (demand, axis) pair, shape ``(len(demand), len(axis))``."""
+    name = AXES[type_input]
+    fixed = {key: value for key, value in params.items() if key not in ("demand", name)}
+    return calculate_values(
+        type_input, variant_input, demand=np.asarray(demand, dtype=float)[:, None],
+        **{name: np.asarray(axis, dtype=float)[None, :]}, **fixed,
+    )
+
+
+class SweepGrid:
+    def __init__(self):
+        self.key = None
+        self.demand = np.empty(0)
+        self.axis = np.empty(0)
+        self.grids = {}
+        self.computed_cells = 0
+
+    def update(self, type_input, params, demand, axis, variants):
+        """Return ``{variant: grid}`` for the requested ranges, reusing cached cells."""
+        demand = np.asarray(demand, dtype=float)
+        axis = np.asarray(axis, dtype=float)
+        name = AXES[type_input]
+        key = (type_input, tuple(sorted((k, v) for k, v in params.items() if k not in ("demand", name))))
+        if key != self.key:
+            self.key, self.grids = key, {}
+
+        old_rows = _positions(self.demand, demand)
+        old_cols = _positions(self.axis, axis)
+        new_rows, new_cols = old_rows < 0, old_cols < 0
+        kept_rows, kept_cols = ~new_rows, ~new_cols
+
+        self.computed_cells = 0
+        grids = {}
+        for variant in variants:
+            previous = self.grids.get(variant)
+            if previous is None:
+                grids[variant] = evaluate(type_input, variant, params, demand, axis)
+                self.computed_cells += grids[variant].size
+                continue
+
+            grid = np.empty((len(demand), len(axis)))
+            grid[np.ix_(kept_rows, kept_cols)] = previous[np.ix_(old_rows[kept_rows], old_cols[kept_cols])]
+            if new_rows.any():
+                grid[new_rows] = evaluate(type_input, variant, params, demand[new_rows], axis)
+                self.computed_cells += new_rows.sum() * len(axis)
+            if new_cols.any() and kept_rows.any():
+                block = evaluate(type_input, variant, params, demand[kept_rows], axis[new_cols])
+                grid[np.ix_(kept_rows, new_cols)] = block
+                self.computed_cells += block.size
+            grids[variant] = grid
+
+        self.demand, self.axis, self.grids = demand, axis, grids
+        return grids
+
+
+def _positions(old, new):
+    """Index of each ``new`` value in ``old``, or -1 where it is absent."""
+    lookup = {value: i for i, value in enumerate(old.tolist())}
+    return np.array([lookup.get(value, -1) for value in new.tolist()], dtype=np.intp)
+
+
+def downsample(grid, demand, axis, max_rows=60, max_cols=60):
+    """Evenly strided view of a grid small enough to draw."""
+    rows = np.unique(np.linspace(0, len(demand) - 1, min(len(demand), max_rows)).round().astype(int))
+    cols = np.unique(np.linspace(0, len(axis) - 1, min(len(axis), max_cols)).round().astype(int))
+    return grid[np.ix_(rows, cols)], demand[rows], axis[cols]
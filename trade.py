@@ -0,0 +1,279 @@
+"""Trade evaluation: value both sides of a multi-pet trade at once.
+
+Each side is a pasted list of pets, one per line (or comma-separated), with
+an optional count and variant:
+
+    Huge Cat
+    3x Shiny Dragon
+    Frost Ember x2
+
+Names are resolved against a ``catalog.Catalog`` (exact names first, then
+names equal ignoring case and punctuation, then the remaining lines in one
+batch through the catalog's fuzzy ``Matcher``), identical pets are merged,
+and every distinct
+pet of both sides is valued in one ``catalog.value_rows`` call:
+
+    trade = evaluate(catalog, give_text, receive_text)
+    trade.give.total, trade.receive.total, trade.ratio
+
+    python trade.py pets.npy give.txt receive.txt
+    python trade.py --bench
+"""
+import argparse
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from catalog import NAME_BYTES, VARIANTS, Catalog, synthetic_records, value_rows
+
+# Longest first, so "shiny mythic" wins over "shiny".
+_VARIANT_PREFIXES = sorted(VARIANTS, key=len, reverse=True)
+_variant_codes = {name: i for i, name in enumerate(VARIANTS)}
+
+_PREFIX_COUNT = re.compile(r"(\d+)\s*[x×*]\s+(.+)", re.IGNORECASE)
+_SUFFIX_COUNT = re.compile(r"(.+?)\s+[x×*]\s*(\d+)", re.IGNORECASE)
+
+
+# ──────────────────────────  Parsing  ──────────────────────────
+def parse_side(pets):
+    """``Counter`` of pet text to quantity for a pasted list (a string) or a
+    list of lines."""
+    counts = Counter()
+    lines = re.split(r"[\n,]", pets) if isinstance(pets, str) else pets
+    for line in lines:
+        line = " ".join(str(line).split())
+        if not line:
+            continue
+        count = 1
+        match = _PREFIX_COUNT.fullmatch(line)
+        if match:
+            count, line = int(match[1]), match[2]
+        else:
+            match = _SUFFIX_COUNT.fullmatch(line)
+            if match:
+                line, count = match[1], int(match[2])
+        counts[line] += count
+    return counts
+
+
+def _split_variant(text):
+    lowered = text.lower()
+    for variant in _VARIANT_PREFIXES:
+        if lowered.startswith(variant + " "):
+            return variant, text[len(variant) + 1:]
+    return None, text
+
+
+def _lookup(catalog, text):
+    """``(row, variant, name)`` for one pet line; ``row`` is None when
+    ``name`` has no exact or normalised match."""
+    index = catalog.index
+    if text in index:
+        return index[text], None, text
+    variant, name = _split_variant(text)
+    if name in index:
+        return index[name], variant, name
+    found = catalog.matcher.lookup(name)
+    return (None if found is None else index[found]), variant, name
+
+
+def resolve_many(catalog, texts, threshold=70, match=None):
+    """``{text: (row, variant) or None}`` for pet lines.
+
+    ``variant`` is None when the catalog's variant applies, else the variant
+    named at the start of the line.  Lines without an exact or normalised
+    match are fuzzy-matched together afterwards; ``match(name, threshold)``
+    defaults to the catalog's ``Matcher.match_many``.
+    """
+    resolved, misses = {}, {}
+    for text in texts:
+        row, variant, name = _lookup(catalog, text)
+        if row is None:
+            misses[text] = variant, name
+        else:
+            resolved[text] = row, variant
+    if misses:
+        queries = [name for _, name in misses.values()]
+        if match is None:
+            names = catalog.matcher.match_many(queries, threshold)
+        else:
+            names = [match(query, threshold) for query in queries]
+        for (text, (variant, _)), name in zip(misses.items(), names):
+            resolved[text] = None if name is None else (catalog.index[name], variant)
+    return resolved
+
+
+def resolve(catalog, text, threshold=70, match=None):
+    """``(row, variant)`` for one pet line, or None if no pet matches."""
+    return resolve_many(catalog, [text], threshold, match)[text]
+
+
+# ──────────────────────────  Evaluation  ──────────────────────────
+class Side:
+    """One side of a trade: ``pets`` (one dict per distinct pet with its
+    name, variant, count, unit value and total), ``unmatched`` lines and
+    the side's ``total``.  Pets without a finite value count as zero."""
+
+    def __init__(self, pets, unmatched):
+        self.pets = pets
+        self.unmatched = unmatched
+        self.count = sum(pet["count"] for pet in pets)
+        self.total = math.fsum(pet["total"] for pet in pets if math.isfinite(pet["total"]))
+
+    def __repr__(self):
+        return f"<Side {self.count:,} pets ({len(self.pets):,} distinct) total={self.total:,.2f}>"
+
+
+class Trade:
+    """Both sides of a trade.  ``ratio`` is what you receive over what you
+    give: above 1 is a win."""
+
+    def __init__(self, give, receive):
+        self.give = give
+        self.receive = receive
+        if give.total:
+            self.ratio = receive.total / give.total
+        else:
+            self.ratio = math.inf if receive.total else math.nan
+
+    @property
+    def verdict(self):
+        if self.ratio > 1:
+            return "win"
+        if self.ratio < 1:
+            return "loss"
+        return "fair" if self.ratio == 1 else "unknown"
+
+    def __repr__(self):
+        return f"<Trade give={self.give.total:,.2f} receive={self.receive.total:,.2f} ratio={self.ratio:.3f}>"
+
+
+def evaluate(catalog, give, receive, threshold=70, match=None):
+    """Value a trade of ``give`` pets for ``receive`` pets, returning a ``Trade``.
+
+    Each pet line is resolved once however often it appears, and each
+    distinct (pet, variant) is valued once across both sides.
+    """
+    sides = [parse_side(give), parse_side(receive)]
+    resolved = resolve_many(catalog, set().union(*sides), threshold, match)
+    keys = list(dict.fromkeys(key for key in resolved.values() if key is not None))
+    positions = {key: i for i, key in enumerate(keys)}
+
+    rows = catalog.rows[np.fromiter((row for row, _ in keys), dtype=np.intp, count=len(keys))]
+    renamed = [(i, _variant_codes[variant]) for i, (_, variant) in enumerate(keys) if variant is not None]
+    if renamed:
+        at, codes = map(list, zip(*renamed))
+        rows["variant"][at] = codes
+        rows["variant_multi"][at] = np.nan  # the new variant's own multiplier
+    values = value_rows(rows).tolist() if len(rows) else []
+    names = [name.decode("utf-8") for name in rows["name"].tolist()]
+    variants = [VARIANTS[code] for code in rows["variant"].tolist()]
+
+    result = []
+    for counts in sides:
+        quantities, unmatched = Counter(), []
+        for text, count in counts.items():
+            key = resolved[text]
+            if key is None:
+                unmatched.append(text)
+            else:
+                quantities[positions[key]] += count
+        pets = [
+            {"name": names[i], "variant": variants[i], "count": count, "value": values[i],
+             "total": count * values[i]}
+            for i, count in quantities.items()
+        ]
+        result.append(Side(pets, unmatched))
+    return Trade(*result)
+
+
+# ──────────────────────────  Benchmark  ──────────────────────────
+def _trade_lines(names, n, rng, typos):
+    from matcher import typo
+
+    lines = []
+    for _ in range(n):
+        name = rng.choice(names)
+        if rng.random() < typos:
+            name = typo(name, rng)
+        elif rng.random() < 0.3:
+            name = name.lower()
+        if rng.random() < 0.3:
+            name = f"{rng.choice(VARIANTS)} {name}"
+        if rng.random() < 0.2:
+            name = f"{rng.randint(2, 5)}x {name}"
+        lines.append(name)
+    return "\n".join(lines)
+
+
+def benchmark(pets=10_000, per_side=500, trades=20, seed=0, out=print):
+    from matcher import pet_names
+
+    rng = random.Random(seed)
+    names = [name for name in pet_names(pets, seed) if len(name) <= NAME_BYTES]
+    with tempfile.TemporaryDirectory() as tmp:
+        records = ({**record, "name": name} for record, name in zip(synthetic_records(pets, seed), names))
+        catalog = Catalog.create(os.path.join(tmp, "pets.npy"), records)
+        start = time.perf_counter()
+        catalog.matcher
+        out(f"build matcher over {pets:,} pets: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for typos in (0.0, 0.01):
+            timings = []
+            for _ in range(trades):
+                give, receive = (_trade_lines(names, per_side, rng, typos) for _ in range(2))
+                start = time.perf_counter()
+                trade = evaluate(catalog, give, receive)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            out(f"{per_side:,} pets per side, {typos:.0%} typos: median {timings[len(timings) // 2] * 1000:.1f} ms, "
+                f"worst {timings[-1] * 1000:.1f} ms ({len(trade.give.pets) + len(trade.receive.pets):,} distinct, "
+                f"{len(trade.give.unmatched) + len(trade.receive.unmatched)} unmatched)")
+
+        # One valuation per pet, as pressing "Calculate Value" for each does.
+        give = _trade_lines(names, per_side, rng, 0.0)
+        start = time.perf_counter()
+        for line in give.splitlines():
+            evaluate(catalog, [line], [])
+        out(f"{per_side:,} pets valued one at a time: {(time.perf_counter() - start) * 1000:.1f} ms")
+        del catalog
+
+
+# ──────────────────────────  CLI  ──────────────────────────
+def _print_side(label, side):
+    print(f"{label}: {side.count:,} pets, {len(side.pets):,} distinct, total {side.total:,.2f}")
+    for pet in sorted(side.pets, key=lambda pet: -pet["total"] if math.isfinite(pet["total"]) else 0):
+        print(f"  {pet['count']:>4}x {pet['name']} ({pet['variant']})  {pet['value']:,.2f}  = {pet['total']:,.2f}")
+    for text in side.unmatched:
+        print(f"  ?     {text} (no match)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Value both sides of a pet trade.")
+    parser.add_argument("catalog", nargs="?", help="pet catalog (.npy) to resolve names against")
+    parser.add_argument("give", nargs="?", help="file listing the pets you give, one per line")
+    parser.add_argument("receive", nargs="?", help="file listing the pets you receive")
+    parser.add_argument("--threshold", type=int, default=70, help="fuzzy match score needed (0-100)")
+    parser.add_argument("--bench", action="store_true", help="time 500-pet-per-side trades")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        benchmark()
+    elif args.receive:
+        with open(args.give, encoding="utf-8") as give, open(args.receive, encoding="utf-8") as receive:
+            trade = evaluate(Catalog(args.catalog, mode="r"), give.read(), receive.read(), args.threshold)
+        _print_side("Give", trade.give)
+        _print_side("Receive", trade.receive)
+        print(f"Ratio {trade.ratio:.3f} ({trade.verdict})")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()